@@ -1,10 +1,19 @@
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from datetime import datetime
+import os
+import requests
+
+VOYAGE_API_URL = os.getenv("VOYAGE_API_URL", "http://host.docker.internal:5050")
+VOYAGE_ADMIN_TOKEN = os.getenv("VOYAGE_ADMIN_TOKEN")
 
 def reload_model():
-    print("🔁 Reloading the latest model or restarting the container...")
-    # You can expand this to actually reload your model in a running API if needed.
+    print("🔁 Asking the running API to hot-reload the latest model...")
+    headers = {"X-Admin-Token": VOYAGE_ADMIN_TOKEN} if VOYAGE_ADMIN_TOKEN else {}
+    response = requests.post(f"{VOYAGE_API_URL}/admin/reload", json={"wait": True}, headers=headers, timeout=300)
+    if response.status_code != 409:  # 409 = a reload is already running
+        response.raise_for_status()
+    print(f"✅ Reload response: {response.json()}")
 
 with DAG(
     dag_id="reload_model_dag",
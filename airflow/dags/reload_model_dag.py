@@ -13,15 +13,27 @@ default_args = {
 
 # --- Define Python Tasks ---
 
-def reload_model():
-    """Simulate reloading the latest ML model from storage or Docker."""
+VOYAGE_API_URL = os.getenv("VOYAGE_API_URL", "http://voyage-analytics-service.voyage-analytics:5050")
+VOYAGE_ADMIN_TOKEN = os.getenv("VOYAGE_ADMIN_TOKEN")
+
+def reload_model(**context):
+    """Ask the running Voyage Analytics API to hot-swap in the latest model (no pod restart)."""
     print("🔁 Reloading the latest Voyage Analytics model...")
-    # Example placeholder logic — replace with your actual model update steps
-    model_path = "/opt/airflow/models/voyage_model.pkl"
-    if os.path.exists(model_path):
-        print(f"✅ Model found at {model_path}. Reloading complete.")
-    else:
-        print("⚠ Model not found. Please verify model upload location.")
+    conf = (context.get("dag_run").conf or {}) if context.get("dag_run") else {}
+    payload = {"wait": True}
+    if conf.get("version"):
+        payload["version"] = conf["version"]
+    headers = {"X-Admin-Token": VOYAGE_ADMIN_TOKEN} if VOYAGE_ADMIN_TOKEN else {}
+
+    response = requests.post(f"{VOYAGE_API_URL}/admin/reload", json=payload, headers=headers, timeout=300)
+    if response.status_code == 409:
+        print("⚠ A reload is already in progress on the API; skipping.")
+        return "Reload already in progress."
+    response.raise_for_status()
+    body = response.json()
+    model = body.get("model") or {}
+    print(f"✅ API worker now serving model version {model.get('version')} from {model.get('path')}.")
+    print(f"ℹ Other workers: {body.get('other_workers')}")
     return "Reload successful."
 
 def notify_jenkins():
@@ -16,7 +16,7 @@ def preprocess_data():
 
 def train_model():
     print("✅ Training model...")
-    os.system("python src/train_regression.py")
+    os.system("python src/train_regression.py --prepared data/prepared")
 
 def deploy_model():
     print("✅ Updating deployment with new model...")
@@ -1,6 +1,10 @@
-import pandas as pd
+import os
+import sys
 
-df = pd.read_csv("data/users.csv")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from schema import read_table
+
+df = read_table("users", "data/users.csv")
 
 # Remove incorrect / unknown genders
 df = df[df["gender"].isin(["male", "female"])]
@@ -0,0 +1,74 @@
+# src/als_engine.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class ImplicitALS:
+    """
+    Alternating least squares for implicit feedback (Hu, Koren & Volinsky, 2008).
+    - preference p_ui = 1 where the weighted matrix is non-zero, confidence c_ui = 1 + alpha * w_ui,
+    - each half-step solves one small k x k system per user (or item); blocks of rows are
+      solved on a thread pool, NumPy's LAPACK calls release the GIL.
+    Scores are user_factors_ @ item_factors_.T, like TruncatedSVD's transform(X) @ components_.
+    """
+
+    def __init__(self, n_factors=50, regularization=0.1, alpha=40.0, iterations=15,
+                 n_threads=None, block_size=256, random_state=42):
+        self.n_factors = n_factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.n_threads = n_threads or os.cpu_count() or 1
+        self.block_size = block_size
+        self.random_state = random_state
+        self.user_factors_ = None
+        self.item_factors_ = None
+
+    def fit(self, matrix):
+        matrix = csr_matrix(matrix, dtype=np.float64)
+        item_users = matrix.T.tocsr()
+        rng = np.random.default_rng(self.random_state)
+        k = self.n_factors
+        self.user_factors_ = rng.normal(scale=0.01, size=(matrix.shape[0], k))
+        self.item_factors_ = rng.normal(scale=0.01, size=(matrix.shape[1], k))
+
+        with ThreadPoolExecutor(max_workers=self.n_threads) as pool:
+            for _ in range(self.iterations):
+                self.user_factors_ = self._solve(matrix, self.item_factors_, pool)
+                self.item_factors_ = self._solve(item_users, self.user_factors_, pool)
+        return self
+
+    def _solve(self, matrix, fixed, pool):
+        """New factors for every row of `matrix` given the other side's `fixed` factors."""
+        k = fixed.shape[1]
+        gram = fixed.T @ fixed + self.regularization * np.eye(k)
+        out = np.empty((matrix.shape[0], k))
+
+        def solve_block(start):
+            stop = min(start + self.block_size, matrix.shape[0])
+            A = np.repeat(gram[None], stop - start, axis=0)
+            b = np.zeros((stop - start, k))
+            for row in range(start, stop):
+                lo, hi = matrix.indptr[row], matrix.indptr[row + 1]
+                if lo == hi:
+                    continue
+                Y = fixed[matrix.indices[lo:hi]]
+                confidence = 1.0 + self.alpha * matrix.data[lo:hi]
+                # A = Y^T C Y + reg * I = gram + Y^T (C - I) Y ;  b = Y^T C p
+                A[row - start] += (Y * (confidence - 1.0)[:, None]).T @ Y
+                b[row - start] = confidence @ Y
+            out[start:stop] = np.linalg.solve(A, b[:, :, None])[:, :, 0]
+
+        list(pool.map(solve_block, range(0, matrix.shape[0], self.block_size)))
+        return out
+
+    def projection(self):
+        """
+        Item-side matrix P so that x @ P folds a new interaction row into user space
+        (least squares against the item factors, ignoring per-item confidence).
+        """
+        Y = self.item_factors_
+        return Y @ np.linalg.inv(Y.T @ Y + self.regularization * np.eye(Y.shape[1]))
@@ -0,0 +1,73 @@
+# src/ann_index.py
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) index for maximum inner product search over item factors.
+    - Items are clustered with k-means; each cluster ("list") stores its item vectors contiguously.
+    - A query scores the centroids, probes the `nprobe` best lists and scores only their items.
+    Item ids returned are row indices into the matrix the index was built from.
+    """
+
+    def __init__(self, centroids, list_offsets, item_ids, vectors):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.item_ids = item_ids
+        self.vectors = vectors
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, random_state=42):
+        # Imported here so serving (load + search) doesn't pay for importing sklearn
+        from sklearn.cluster import KMeans
+
+        vectors = np.asarray(vectors)
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        kmeans = KMeans(n_clusters=n_lists, n_init=1, random_state=random_state).fit(vectors)
+
+        assignments = kmeans.labels_
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(
+            centroids=kmeans.cluster_centers_.astype(vectors.dtype),
+            list_offsets=offsets.astype(np.int64),
+            item_ids=order.astype(np.int64),
+            vectors=np.ascontiguousarray(vectors[order]),
+        )
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, list_offsets=self.list_offsets,
+                 item_ids=self.item_ids, vectors=self.vectors)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def candidates(self, query, nprobe=8):
+        """(item_ids, scores) for every item in the `nprobe` lists closest to the query."""
+        nprobe = min(nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+        starts, ends = self.list_offsets[probe], self.list_offsets[probe + 1]
+        positions = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        return self.item_ids[positions], self.vectors[positions] @ query
+
+    def search(self, query, k, nprobe=8):
+        """Approximate top-k (item_ids, scores) by inner product, best first."""
+        ids, scores = self.candidates(query, nprobe)
+        k = min(k, len(ids))
+        if k <= 0:
+            return ids[:0], scores[:0]
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+        top = top[np.lexsort((ids[top], -scores[top]))]  # ties by item id, like the exact path
+        return ids[top], scores[top]
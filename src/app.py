@@ -1,16 +1,27 @@
 # src/app.py
 from flask import Flask, request, jsonify
 import os
+import re
 import sys
+import hmac
 import json
 import logging
 from pathlib import Path
 import threading
+import time
+import uuid
 import argparse
 
 import joblib
+import numpy as np
 import pandas as pd
 
+from feature_assembler import FeatureAssembler, DATE_PREFIXES
+from micro_batcher import MicroBatcher, BatcherUnavailable
+from forest_engine import CompiledPipeline
+from prediction_cache import PredictionCache, InMemoryBackend, RedisBackend
+from gender_classifier import GenderClassifier, parse_record
+
 # --- Logging setup ---
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
@@ -18,50 +29,312 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 
 # --- Paths ---
-MODEL_PATH = Path("model/voyage_model/1/model.pkl")
+# Models live under model/voyage_model/<version>/model.pkl; MODEL_VERSION=latest picks the highest version
+MODEL_DIR = Path(os.getenv("MODEL_DIR", "model/voyage_model"))
+MODEL_VERSION = os.getenv("MODEL_VERSION", "latest")
 COLUMNS_PATH = Path("src/columns.json")
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))  # seconds, 0 = no file watching
+# /admin/reload records each successful reload here; the watcher of every other worker repeats it.
+# The default lives in the pod's own MODEL_DIR, so it reaches the workers of one pod only;
+# point it at shared storage (e.g. a ReadWriteMany volume) to reach every replica.
+MODEL_RELOAD_MARKER = Path(os.getenv("MODEL_RELOAD_MARKER", str(MODEL_DIR / "reload.json")))
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "sklearn")  # "flat" = forest_engine.CompiledPipeline
+
+def check_version(version):
+    """Only "latest" or a plain version number: the version becomes a path under MODEL_DIR."""
+    version = str(version)
+    if version != "latest" and not re.fullmatch(r"[0-9]+", version):
+        raise ValueError(f"Invalid model version {version!r}, expected 'latest' or a version number")
+    return version
+
+def resolve_model_path(version=None):
+    version = check_version(version or active_version)
+    if version == "latest":
+        versions = []
+        if MODEL_DIR.exists():
+            versions = [int(p.name) for p in MODEL_DIR.iterdir() if p.name.isdigit() and (p / "model.pkl").exists()]
+        version = str(max(versions)) if versions else "1"
+    return MODEL_DIR / version / "model.pkl"
+
+def resolve_columns_path(model_path):
+    """Prefer a columns.json saved next to the model, else the one in src/."""
+    local = model_path.parent / "columns.json"
+    return local if local.exists() else COLUMNS_PATH
+
+active_version = MODEL_VERSION
+MODEL_PATH = resolve_model_path()
 
 logger.info("[INFO] Starting Flask app... importing dependencies, please wait...")
 logger.info("[INFO] Checking model path... %s", MODEL_PATH.resolve())
 
 # --- Model load (non-fatal) ---
+# model / assembler / model_info are only ever replaced together under _state_lock;
+# requests take a snapshot via current_model() so a reload never changes them mid-request.
 model = None
+assembler = None
+model_info = {}
 model_loaded = False
 load_error = None
+_state_lock = threading.Lock()
+_reload_lock = threading.Lock()
+reload_hooks = []  # callables run after every successful swap
+
+def _mtime(path):
+    return path.stat().st_mtime if path.exists() else None
+
+def load_artifacts(model_path):
+    """Load the pipeline and its FeatureAssembler from disk without touching the served state."""
+    columns_path = resolve_columns_path(model_path)
+    new_assembler = None
+    if columns_path.exists():
+        try:
+            new_assembler = FeatureAssembler.from_json(columns_path)
+        except Exception as e:
+            logger.warning("⚠️ Failed reading columns.json: %s", e)
+    else:
+        logger.warning("⚠️ No columns.json found — predictions may be incomplete.")
+
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model not found: {model_path.resolve()}")
+    logger.info("📦 Loading pipeline from %s", model_path)
+    new_model = joblib.load(model_path)
+    engine = MODEL_ENGINE
+    if engine == "flat" and not hasattr(new_model[-1], "estimators_"):
+        # e.g. train_regression.py --model hgb: only forests can be flattened
+        logger.warning("⚠️ %s is not a forest, serving it with sklearn", type(new_model[-1]).__name__)
+        engine = "sklearn"
+    if engine == "flat":
+        # Use an exported forest.npz if it is at least as new as model.pkl, else flatten on load
+        forest_path = model_path.parent / "forest.npz"
+        fresh = forest_path.exists() and _mtime(forest_path) >= _mtime(model_path)
+        new_model = CompiledPipeline.from_pipeline(new_model, forest_path if fresh else None)
+    info = {
+        "path": str(model_path),
+        "version": model_path.parent.name,
+        "engine": engine,
+        "columns_path": str(columns_path),
+        "mtime": _mtime(model_path),
+        "tag": f"{model_path.parent.name}-{int(_mtime(model_path))}",
+        "columns_mtime": _mtime(columns_path),
+        "loaded_at": time.time(),
+    }
+    return new_model, new_assembler, info
+
+def reload_model(version=None):
+    """
+    Load a model in the calling thread, then swap it in atomically.
+    Requests already running keep the model they started with; on failure the old model stays.
+    """
+    global model, assembler, model_info, model_loaded, load_error, active_version
+    with _reload_lock:
+        new_model, new_assembler, info = load_artifacts(resolve_model_path(version))
+        with _state_lock:
+            model, assembler, model_info = new_model, new_assembler, info
+            model_loaded = True
+            load_error = None
+        if version:
+            active_version = str(version)
+        for hook in reload_hooks:
+            try:
+                hook()
+            except Exception as e:
+                # The new model is already live: a failed hook must not report the reload as failed
+                logger.error("❌ Reload hook %s failed: %s", getattr(hook, "__qualname__", hook), e)
+    logger.info("✅ Pipeline loaded successfully! (version %s)", info["version"])
+    return info
+
+def current_model():
+    """Snapshot of (model, assembler, model tag) to use for one request."""
+    with _state_lock:
+        return model, assembler, model_info.get("tag", "")
 
 def try_load_model():
     """Attempt to load model; don't crash the app if unavailable."""
-    global model, model_loaded, load_error
-    if not MODEL_PATH.exists():
-        load_error = FileNotFoundError(f"Model not found: {MODEL_PATH.resolve()}")
-        logger.warning("⚠️ %s", load_error)
-        return
+    global load_error
     try:
-        logger.info("📦 Loading pipeline from %s", MODEL_PATH)
-        model = joblib.load(MODEL_PATH)
-        model_loaded = True
-        logger.info("✅ Pipeline loaded successfully!")
+        reload_model()
+    except FileNotFoundError as e:
+        load_error = e
+        logger.warning("⚠️ %s", load_error)
     except Exception as e:
         load_error = e
         logger.error("❌ Failed to load model: %s", e)
 
-thread = threading.Thread(target=try_load_model, daemon=True)
-thread.start()
-thread.join(timeout=20)
-if thread.is_alive():
-    logger.warning("⚠️ Model loading timed out; continuing without model for now.")
+def start_model_load(timeout=20):
+    """Load the model in a thread, waiting at most `timeout` seconds before serving without it."""
+    thread = threading.Thread(target=try_load_model, daemon=True)
+    thread.start()
+    thread.join(timeout=timeout)
+    if thread.is_alive():
+        logger.warning("⚠️ Model loading timed out; continuing without model for now.")
+
+# --- Gender classifier (optional, served at /classify/gender) ---
+GENDER_NAME_CACHE_SIZE = int(os.getenv("GENDER_NAME_CACHE_SIZE", "10000"))  # first-name vectors, 0 = disabled
+gender_classifier = None
+gender_load_error = None
+
+def try_load_gender_classifier():
+    """Load the gender model once from its local MLflow copy; the price API works without it."""
+    global gender_classifier, gender_load_error
+    try:
+        gender_classifier = GenderClassifier.load(cache_size=GENDER_NAME_CACHE_SIZE)
+        gender_load_error = None
+        logger.info("✅ Gender classifier loaded")
+    except Exception as e:
+        gender_load_error = e
+        logger.warning("⚠️ Gender classifier not loaded: %s", e)
+
+# serve.py sets APP_DEFER_MODEL_LOAD=1 and loads the models once in the parent before forking workers
+if os.getenv("APP_DEFER_MODEL_LOAD", "0") != "1":
+    start_model_load()
+    try_load_gender_classifier()
+
+# --- Hot reload on artifact change or on a reload done by another worker ---
+_watcher_pid = None
+
+def read_reload_marker():
+    """The last reload recorded by /admin/reload ({"id", "version", ...}), or {} if none."""
+    try:
+        marker = json.loads(MODEL_RELOAD_MARKER.read_text())
+    except (OSError, ValueError):
+        return {}
+    return marker if isinstance(marker, dict) else {}
+
+# Markers already on disk at startup are not replayed; forked workers inherit this from the parent
+_marker_id = read_reload_marker().get("id")
+
+def write_reload_marker(version):
+    """Atomically record a successful reload of `version` for the other workers to repeat."""
+    global _marker_id
+    marker = {"id": uuid.uuid4().hex, "version": version, "pid": os.getpid(), "written_at": time.time()}
+    tmp = MODEL_RELOAD_MARKER.with_name(f".{MODEL_RELOAD_MARKER.name}.{os.getpid()}")
+    tmp.write_text(json.dumps(marker))
+    _marker_id = marker["id"]
+    os.replace(tmp, MODEL_RELOAD_MARKER)
+
+def artifacts_changed():
+    """True if the model/columns files (or the resolved version) differ from what is being served."""
+    path = resolve_model_path()
+    if str(path) != model_info.get("path"):
+        return path.exists()
+    return (_mtime(path) != model_info.get("mtime")
+            or _mtime(resolve_columns_path(path)) != model_info.get("columns_mtime"))
+
+def check_for_reload():
+    """Reload if another worker recorded a reload since ours, or if the artifacts changed on disk."""
+    global _marker_id
+    if _reload_lock.locked():
+        return
+    marker = read_reload_marker()
+    if marker.get("id") not in (None, _marker_id):
+        _marker_id = marker["id"]
+        logger.info("🔁 Reload of version %s requested by another worker; reloading...", marker.get("version"))
+        reload_model(marker.get("version"))
+    elif artifacts_changed():
+        logger.info("🔁 Model artifacts changed on disk; reloading...")
+        reload_model()
+
+def _check_for_reload():
+    try:
+        check_for_reload()
+    except Exception as e:
+        logger.error("❌ Hot reload failed, keeping current model: %s", e)
+
+def _watch_artifacts(interval):
+    while True:
+        time.sleep(interval)
+        _check_for_reload()
+
+def start_model_watcher(check_now=False):
+    """Start this process's watcher thread (once per pid); check_now catches up before returning."""
+    global _watcher_pid
+    if MODEL_WATCH_INTERVAL <= 0 or _watcher_pid == os.getpid():
+        return
+    _watcher_pid = os.getpid()
+    if check_now:
+        _check_for_reload()
+    threading.Thread(target=_watch_artifacts, args=(MODEL_WATCH_INTERVAL,), daemon=True).start()
+
+@app.before_request
+def ensure_model_watcher():
+    # serve.py starts the watcher when a worker is forked; this covers the Flask dev server
+    start_model_watcher()
+
+# --- Micro-batching (optional) ---
+batcher = None
+# Seconds a request waits for its micro-batched prediction before answering 503
+MICRO_BATCH_TIMEOUT = float(os.getenv("MICRO_BATCH_TIMEOUT", "10"))
+
+def configure_micro_batching(max_batch_size, max_wait_ms, max_queue=10000):
+    """Route predictions through a MicroBatcher that merges concurrent requests."""
+    global batcher
+    batcher = MicroBatcher(max_batch_size, max_wait_ms, max_queue)
+    logger.info("Micro-batching enabled: max_batch_size=%s, max_wait_ms=%s", max_batch_size, max_wait_ms)
 
-# --- Load columns info (non-fatal) ---
-required_cols = []
-if COLUMNS_PATH.exists():
+if os.getenv("MICRO_BATCH", "0").lower() in ("1", "true", "yes"):
+    configure_micro_batching(
+        int(os.getenv("MICRO_BATCH_MAX_ROWS", "64")),
+        float(os.getenv("MICRO_BATCH_WAIT_MS", "2")),
+        int(os.getenv("MICRO_BATCH_MAX_QUEUE", "10000")),
+    )
+
+# --- Prediction cache (optional) ---
+# Keys hash the assembled feature row and are namespaced by model tag (version + mtime)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "0"))  # opt-in: 0 = disabled, > 0 enables either backend
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+PREDICTION_CACHE_BACKEND = os.getenv("PREDICTION_CACHE_BACKEND", "memory")  # memory | redis
+
+prediction_cache = None
+if PREDICTION_CACHE_SIZE > 0:
     try:
-        with open(COLUMNS_PATH, "r") as f:
-            columns_info = json.load(f)
-        required_cols = columns_info.get("num_cols", []) + columns_info.get("cat_cols", [])
+        if PREDICTION_CACHE_BACKEND == "redis":
+            backend = RedisBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"), PREDICTION_CACHE_TTL)
+        else:
+            backend = InMemoryBackend(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+        prediction_cache = PredictionCache(backend)
     except Exception as e:
-        logger.warning("⚠️ Failed reading columns.json: %s", e)
-else:
-    logger.warning("⚠️ No columns.json found — predictions may be incomplete.")
+        logger.warning("⚠️ Prediction cache disabled: %s", e)
+
+def _cache_error(action, e):
+    """A cache backend failure (e.g. Redis down): log and count it; the caller carries on uncached."""
+    logger.warning("⚠️ Prediction cache %s failed, continuing without it: %s", action, e)
+    prediction_cache.count_error()
+
+def invalidate_prediction_cache():
+    try:
+        prediction_cache.invalidate()
+    except Exception as e:
+        _cache_error("invalidate", e)
+
+if prediction_cache is not None:
+    reload_hooks.append(invalidate_prediction_cache)
+
+def _predict(served_model, X):
+    """Predict directly, or via the micro-batcher when enabled (large batches go direct)."""
+    if batcher is not None and len(X) < batcher.max_batch_size:
+        return batcher.predict(served_model, X, timeout=MICRO_BATCH_TIMEOUT)
+    return served_model.predict(X)
+
+def run_model(served_model, X, tag=""):
+    """Predict X, serving repeated feature rows from the prediction cache when enabled."""
+    if prediction_cache is None:
+        return _predict(served_model, X)
+    keys = PredictionCache.row_keys(X, tag)
+    try:
+        preds = prediction_cache.get_many(keys)
+    except Exception as e:
+        _cache_error("read", e)  # a cache outage must never fail a prediction
+        return _predict(served_model, X)
+    missing = [i for i, p in enumerate(preds) if p is None]
+    if missing:
+        fresh = _predict(served_model, X if len(missing) == len(X) else X.iloc[missing])
+        try:
+            prediction_cache.set_many([keys[i] for i in missing], fresh)
+        except Exception as e:
+            _cache_error("write", e)
+        for i, p in zip(missing, fresh):
+            preds[i] = p
+    return np.asarray(preds, dtype=np.float64)
 
 # --- Routes ---
 @app.get("/health")
@@ -70,55 +343,282 @@ def health():
         status="ok",
         port=app.config.get("APP_PORT"),
         model_loaded=model_loaded,
-        load_error=str(load_error) if load_error else None
+        load_error=str(load_error) if load_error else None,
+        model=model_info or None,
+        micro_batching=batcher.metrics() if batcher is not None else None,
+        prediction_cache=prediction_cache.stats() if prediction_cache is not None else None,
+        gender_classifier=gender_classifier.stats() if gender_classifier is not None
+        else {"loaded": False, "load_error": str(gender_load_error) if gender_load_error else None}
+    ), 200
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: only 200 once the model is loaded and can serve predictions."""
+    if not model_loaded:
+        return jsonify(ready=False, load_error=str(load_error) if load_error else None), 503
+    return jsonify(ready=True), 200
+
+@app.get("/metrics")
+def metrics():
+    return jsonify(
+        micro_batching=batcher.metrics() if batcher is not None else None,
+        prediction_cache=prediction_cache.stats() if prediction_cache is not None else None
     ), 200
 
 @app.get("/")
 def home():
     return jsonify({"status": "Voyage Analytics API is running", "port": app.config.get("APP_PORT")})
 
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+def split_dates(data):
+    """Convert date strings -> year/month/day (in place) and return the record."""
+    for prefix in DATE_PREFIXES:
+        if prefix in data and data[prefix]:
+            dt = pd.to_datetime(data[prefix])
+            data[f"{prefix}_year"] = int(dt.year)
+            data[f"{prefix}_month"] = int(dt.month)
+            data[f"{prefix}_day"] = int(dt.day)
+            del data[prefix]
+    return data
+
+def build_features(records, served_assembler):
+    """
+    Turn request records into the model's feature frame.
+    Returns (X, kept, errors) — see FeatureAssembler.assemble.
+    Uses the precompiled assembler; falls back to plain pandas if columns.json is missing.
+    """
+    if served_assembler is not None:
+        return served_assembler.assemble(records)
+
+    kept, rows, errors = [], [], {}
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[i] = "Record must be a JSON object"
+            continue
+        try:
+            rows.append(split_dates(dict(record)))
+            kept.append(i)
+        except Exception as e:
+            errors[i] = str(e)
+    return pd.DataFrame(rows), kept, errors
+
+def read_batch_records():
+    """Parse a batch body: a JSON list, {"records": [...]}, or NDJSON lines."""
+    content_type = (request.content_type or "").lower()
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        lines = request.get_data(as_text=True).splitlines()
+        records = []
+        for n, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                # Keep the slot so the response stays aligned with the input lines
+                records.append(ValueError(f"line {n}: invalid JSON ({e})"))
+        return records
+
+    payload = request.get_json(force=True)
+    if isinstance(payload, dict):
+        payload = payload.get("records")
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON list of records, {\"records\": [...]}, or NDJSON")
+    return payload
+
 @app.post("/predict")
 def predict():
     if not model_loaded:
         return jsonify(error="Model not loaded", details=str(load_error) if load_error else None), 503
+    served_model, served_assembler, served_tag = current_model()
     try:
         data = request.get_json(force=True) or {}
         logger.info("Received data keys: %s", list(data.keys()))
 
-        # Convert date strings -> year/month/day
-        for prefix in ["date_flight", "date_hotel"]:
-            if prefix in data and data[prefix]:
-                dt = pd.to_datetime(data[prefix])
-                data[f"{prefix}_year"] = int(dt.year)
-                data[f"{prefix}_month"] = int(dt.month)
-                data[f"{prefix}_day"] = int(dt.day)
-                del data[prefix]
-
-        # To DataFrame
-        df = pd.DataFrame([data])
-
-        # Ensure expected columns exist and order them
-        for col in required_cols:
-            if col not in df.columns:
-                df[col] = None
-        if required_cols:
-            df = df[required_cols]
+        X, _, errors = build_features([data], served_assembler)
+        if errors:
+            raise ValueError(errors[0])
 
         # Predict
-        preds = model.predict(df)
+        preds = run_model(served_model, X, served_tag)
         preds = [max(0, float(p)) for p in preds]  # non-negative, JSON-friendly
 
         return jsonify({"prediction": preds})
+    except BatcherUnavailable as e:
+        logger.error("Prediction unavailable: %s", e)
+        return jsonify(error=str(e)), 503
     except Exception as e:
         logger.error("Prediction error: %s", e)
         return jsonify(error=str(e)), 400
 
+@app.post("/predict/batch")
+def predict_batch():
+    """Price many records with one vectorized `model.predict` call.
+
+    Each input record gets one result, either {"prediction": x} or {"error": msg},
+    so a bad record does not fail the rest of the batch.
+    """
+    if not model_loaded:
+        return jsonify(error="Model not loaded", details=str(load_error) if load_error else None), 503
+    try:
+        records = read_batch_records()
+    except Exception as e:
+        logger.error("Batch payload error: %s", e)
+        return jsonify(error=str(e)), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify(error=f"Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})"), 413
+    served_model, served_assembler, served_tag = current_model()
+
+    results = [None] * len(records)
+    parsed = []  # input positions of records that were valid JSON
+    for i, record in enumerate(records):
+        if isinstance(record, Exception):
+            results[i] = {"error": str(record)}
+        else:
+            parsed.append(i)
+
+    X, kept, errors = build_features([records[i] for i in parsed], served_assembler)
+    for pos, message in errors.items():
+        results[parsed[pos]] = {"error": message}
+    kept = [parsed[pos] for pos in kept]
+
+    if kept:
+        try:
+            preds = run_model(served_model, X, served_tag)
+            for i, p in zip(kept, preds):
+                results[i] = {"prediction": max(0, float(p))}
+        except BatcherUnavailable as e:
+            logger.error("Batch prediction unavailable: %s", e)
+            return jsonify(error=str(e)), 503
+        except Exception as e:
+            # Vectorized call failed: retry row by row to isolate the bad records
+            logger.warning("Batch prediction failed (%s); falling back to per-record predict", e)
+            for row, i in enumerate(kept):
+                try:
+                    results[i] = {"prediction": max(0, float(served_model.predict(X.iloc[[row]])[0]))}
+                except Exception as row_error:
+                    results[i] = {"error": str(row_error)}
+
+    n_errors = sum(1 for r in results if "error" in r)
+    logger.info("Batch of %d records priced (%d errors)", len(results), n_errors)
+    return jsonify({"results": results, "count": len(results), "errors": n_errors})
+
+@app.post("/classify/gender")
+def classify_gender():
+    """Classify many (name, age) records with one vectorizer call and one model call.
+
+    Body: a JSON list, {"records": [...]}, or NDJSON; each record is {"name": ..., "age": ...}
+    or [name, age]. Each record gets {"gender": g, "probability": p} or {"error": msg}.
+    """
+    if gender_classifier is None:
+        return jsonify(error="Gender classifier not loaded",
+                       details=str(gender_load_error) if gender_load_error else None), 503
+    try:
+        records = read_batch_records()
+    except Exception as e:
+        logger.error("Gender batch payload error: %s", e)
+        return jsonify(error=str(e)), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify(error=f"Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})"), 413
+    classifier = gender_classifier
+
+    results = [None] * len(records)
+    kept, names, ages = [], [], []
+    for i, record in enumerate(records):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            name, age = parse_record(record)
+        except ValueError as e:
+            results[i] = {"error": str(e)}
+            continue
+        kept.append(i)
+        names.append(name)
+        ages.append(age)
+
+    if kept:
+        try:
+            labels, probabilities = classifier.predict(names, ages)
+        except Exception as e:
+            logger.error("Gender classification error: %s", e)
+            return jsonify(error=str(e)), 500
+        for i, label, p in zip(kept, labels, probabilities):
+            results[i] = {"gender": label, "probability": float(p)}
+
+    n_errors = sum(1 for r in results if "error" in r)
+    logger.info("Batch of %d names classified (%d errors)", len(results), n_errors)
+    return jsonify({"results": results, "count": len(results), "errors": n_errors})
+
+def propagate_reload():
+    """Record a reload this worker completed so the others repeat it; returns a note for the response."""
+    try:
+        write_reload_marker(active_version)
+    except OSError as e:
+        logger.error("❌ Could not write %s, other workers keep their model: %s", MODEL_RELOAD_MARKER, e)
+        return f"not reloaded (could not write {MODEL_RELOAD_MARKER}: {e})"
+    if MODEL_WATCH_INTERVAL <= 0:
+        return "not reloaded (MODEL_WATCH_INTERVAL=0)"
+    return f"reload within {MODEL_WATCH_INTERVAL:g}s (workers sharing {MODEL_RELOAD_MARKER})"
+
+def _reload_in_background(version):
+    try:
+        reload_model(version)
+    except Exception as e:
+        logger.error("❌ Reload failed, keeping current model: %s", e)
+        return
+    propagate_reload()
+
+@app.post("/admin/reload")
+def admin_reload():
+    """
+    Reload the model without a restart. Optional body/query: version=<n|latest>, wait=1.
+    Loads in a background thread (202) unless wait=1 (200 once swapped in).
+    The X-Admin-Token header must match ADMIN_TOKEN; without ADMIN_TOKEN the endpoint is disabled (403).
+    Under serve.py only the worker that gets this request reloads here; once it succeeds it writes
+    MODEL_RELOAD_MARKER and the watchers of the other workers that read the same file repeat the
+    reload within MODEL_WATCH_INTERVAL seconds ("other_workers" in the response says whether they will).
+    With the default marker path that is the other workers of this pod only; other replicas need
+    their own request (or a marker on shared storage).
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token):
+        return jsonify(error="Forbidden"), 403
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    version = body.get("version") or request.args.get("version")
+    if version is not None:
+        try:
+            version = check_version(version)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+    wait = str(body.get("wait", request.args.get("wait", "0"))).lower() in ("1", "true", "yes")
+    if _reload_lock.locked():
+        return jsonify(status="busy", error="A reload is already in progress"), 409
+
+    if wait:
+        try:
+            info = reload_model(version)
+        except Exception as e:
+            logger.error("❌ Reload failed, keeping current model: %s", e)
+            return jsonify(status="failed", error=str(e), model=model_info or None), 500
+        return jsonify(status="reloaded", model=info, other_workers=propagate_reload()), 200
+
+    threading.Thread(target=_reload_in_background, args=(version,), daemon=True).start()
+    return jsonify(status="reloading", version=version or active_version,
+                   other_workers="reload after this worker succeeds"), 202
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", default="127.0.0.1")  # loopback for Jenkins probe
     parser.add_argument("--port", type=int, default=int(os.getenv("FLASK_PORT", "5055")))
+    parser.add_argument("--micro-batch", action="store_true", help="Merge concurrent requests into one predict call")
+    parser.add_argument("--batch-max-rows", type=int, default=int(os.getenv("MICRO_BATCH_MAX_ROWS", "64")))
+    parser.add_argument("--batch-wait-ms", type=float, default=float(os.getenv("MICRO_BATCH_WAIT_MS", "2")))
     args = parser.parse_args()
 
+    if args.micro_batch:
+        configure_micro_batching(args.batch_max_rows, args.batch_wait_ms)
+
     app.config["APP_PORT"] = args.port
     logger.info("🚀 Starting Flask server at http://%s:%s/ ...", args.host, args.port)
     app.run(host=args.host, port=args.port, debug=False)
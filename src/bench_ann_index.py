@@ -0,0 +1,79 @@
+# src/bench_ann_index.py
+"""
+Recall@k vs. latency of the IVF index against exact top-k over the item factors.
+
+Uses synthetic clustered factor matrices of several catalogue sizes, plus the
+trained item factors in models/ when they exist.
+
+Usage:
+    python src/bench_ann_index.py --sizes 10000 100000 --top-k 10
+"""
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex
+
+
+def synthetic_factors(n_items, dim, rng, n_clusters=64):
+    centers = rng.normal(size=(n_clusters, dim))
+    labels = rng.integers(0, n_clusters, size=n_items)
+    return centers[labels] + 0.3 * rng.normal(size=(n_items, dim))
+
+
+def exact_top_k(items, query, k):
+    scores = items @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def run(name, items, queries, k, nprobes):
+    k = min(k, len(items))
+    start = time.perf_counter()
+    index = IVFIndex.build(items)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    truth = [exact_top_k(items, q, k) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+
+    print(f"\n{name}: {len(items)} items, dim {items.shape[1]}, {index.n_lists} lists (build {build_s:.2f}s)")
+    print(f"{'nprobe':>7} | {'recall@' + str(k):>10} | {'ms/query':>9} | {'speedup':>7}")
+    print(f"{'exact':>7} | {1.0:>10.4f} | {exact_ms:>9.4f} | {1.0:>6.1f}x")
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [index.search(q, k, nprobe)[0] for q in queries]
+        ann_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+        recall = np.mean([len(np.intersect1d(f, t)) / k for f, t in zip(found, truth)])
+        print(f"{nprobe:>7} | {recall:>10.4f} | {ann_ms:>9.4f} | {exact_ms / ann_ms:>6.1f}x")
+
+
+def main(args):
+    rng = np.random.default_rng(42)
+    for n_items in args.sizes:
+        items = synthetic_factors(n_items, args.dim, rng)
+        queries = items[rng.integers(0, n_items, size=args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim))
+        run("synthetic", items, queries, args.top_k, args.nprobes)
+
+    svd_path = os.path.join(args.models, "recommender_svd.pkl")
+    if os.path.exists(svd_path):
+        with open(svd_path, "rb") as f:
+            svd = pickle.load(f)
+        items = svd.components_.T
+        queries = items[rng.integers(0, len(items), size=args.queries)]
+        run("trained", items, queries, args.top_k, args.nprobes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--models", default="models")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,139 @@
+# src/bench_feature_encoding.py
+"""
+Benchmark the categorical encodings of features.prepare_X_y for the price model.
+
+For each encoding:
+- onehot  : dense float64 one-hot block + RandomForestRegressor (the current model),
+- sparse  : CSR one-hot + the same RandomForestRegressor,
+- ordinal : one code per categorical column + HistGradientBoostingRegressor with native
+            categorical splits (not the forest: it would treat the codes as ordered numbers),
+report the size of the transformed training matrix, transform/fit time, held-out r2,
+pipeline.predict latency at serving batch sizes, and for sparse how far its predictions
+are from the dense ones (same feature values; only split tie-breaking can differ).
+
+A near-perfect held-out r2 is expected rather than a leak: flight prices are a fixed fare per
+route, flight type and agency. The benchmark reports a no-model baseline to show it: the mean
+training price of each held-out row's fare columns (fitted on the training split only).
+
+Usage:
+    python src/bench_feature_encoding.py --users data/users.csv --flights data/flights.csv --hotels data/hotels.csv
+    python src/bench_feature_encoding.py --prepared data/prepared --rows 100000 --n-estimators 50
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from features import categorical_mask, prepare_X_y
+from forest_engine import CompiledPipeline
+from train_regression import load_training_frame
+
+# Flight prices are a fixed fare per route, flight type and agency
+FARE_COLUMNS = ("from", "to", "flightType", "agency")
+
+
+def matrix_mb(matrix):
+    if sparse.issparse(matrix):
+        return (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1024 ** 2
+    return np.asarray(matrix).nbytes / 1024 ** 2
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def predict_ms(model, X, repeat):
+    model.predict(X)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000.0
+
+
+def main(args):
+    df = load_training_frame(args.users, args.flights, args.hotels, args.prepared)
+    if args.rows and args.rows < len(df):
+        df = df.sample(n=args.rows, random_state=42)
+    rf_params = {"n_estimators": args.n_estimators, "max_depth": 10, "random_state": 42, "n_jobs": args.n_jobs}
+
+    variants = [("onehot", "rf"), ("sparse", "rf"), ("ordinal", "hgb")]
+    results, fitted = {}, {}
+    for encoding, model in variants:
+        X, y, preprocessor, num_cols, cat_cols = prepare_X_y(df, target="price", top_k=50, encoding=encoding)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        Xt, transform_s = timed(lambda: preprocessor.fit_transform(X_train, y_train))
+
+        if model == "rf":
+            regressor = RandomForestRegressor(**rf_params)
+        else:
+            regressor = HistGradientBoostingRegressor(categorical_features=categorical_mask(num_cols, cat_cols),
+                                                      max_iter=300, max_leaf_nodes=63, random_state=42)
+        _, fit_s = timed(lambda: regressor.fit(Xt, y_train))
+        pipeline = Pipeline([("preprocessor", preprocessor), ("regressor", regressor)])
+
+        name = f"{encoding}+{model}"
+        fitted[name] = pipeline
+        results[name] = {
+            "columns": Xt.shape[1],
+            "xt_mb": matrix_mb(Xt),
+            "transform_s": transform_s,
+            "fit_s": fit_s,
+            "r2": pipeline.score(X_test, y_test),
+            "predict_ms": {b: predict_ms(pipeline, X_test.iloc[:b], args.repeat) for b in args.batch_sizes},
+        }
+
+    print(f"\nINFO: {len(df)} rows (80% train / 20% held out), forest: {args.n_estimators} trees")
+    print(f"\n{'variant':>12} | {'columns':>7} | {'Xt MB':>8} | {'transform s':>11} | {'fit s':>7} | {'r2':>6} | "
+          + " | ".join(f"{f'predict {b} ms':>14}" for b in args.batch_sizes))
+    print("-" * (72 + 17 * len(args.batch_sizes)))
+    for name, r in results.items():
+        print(f"{name:>12} | {r['columns']:>7} | {r['xt_mb']:>8.2f} | {r['transform_s']:>11.2f} | {r['fit_s']:>7.2f} | "
+              f"{r['r2']:>6.4f} | " + " | ".join(f"{r['predict_ms'][b]:>14.3f}" for b in args.batch_sizes))
+
+    # Target-leak check: how much of the held-out price the fare columns alone explain
+    X, y, _, _, cat_cols = prepare_X_y(df, target="price", top_k=50)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    fare_cols = [c for c in FARE_COLUMNS if c in cat_cols]
+    lookup = y_train.groupby([X_train[c].astype(str) for c in fare_cols]).agg(["mean", "std"])
+    test_keys = pd.MultiIndex.from_arrays([X_test[c].astype(str) for c in fare_cols])
+    lookup_pred = lookup["mean"].reindex(test_keys).fillna(y_train.mean()).to_numpy()
+    print(f"\nINFO: no-model baseline (mean training price per {'/'.join(fare_cols)}): held-out r2 = "
+          f"{r2_score(y_test, lookup_pred):.4f}, max price std within a group = {lookup['std'].max():.3g}, "
+          f"held-out rows in unseen groups: {np.mean(np.isnan(lookup['mean'].reindex(test_keys))):.2%}")
+
+    # Equivalence: dense and CSR one-hot carry the same feature values
+    dense_pred = fitted["onehot+rf"].predict(X_test)
+    sparse_pred = fitted["sparse+rf"].predict(X_test)
+    flat_pred = CompiledPipeline.from_pipeline(fitted["sparse+rf"]).predict(X_test)
+    # sklearn's sparse splitter can break ties between equally good splits differently, so a few
+    # rows may land in other leaves; report how many and by how much
+    diff = np.abs(dense_pred - sparse_pred)
+    print(f"\nINFO: onehot vs sparse forest predictions: max |diff| = {diff.max():.3e} "
+          f"(max relative {(diff / np.abs(dense_pred)).max():.2e}, rows differing: {np.mean(diff > 1e-9):.2%})")
+    print(f"INFO: sparse pipeline vs FlatForest on CSR input: bit-equal = {np.array_equal(sparse_pred, flat_pred)}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dense, sparse and ordinal categorical encodings")
+    parser.add_argument("--users", default="data/users.csv")
+    parser.add_argument("--flights", default="data/flights.csv")
+    parser.add_argument("--hotels", default="data/hotels.csv")
+    parser.add_argument("--prepared", default=None, help="column store from src/preprocess.py (instead of CSVs)")
+    parser.add_argument("--rows", type=int, default=None, help="subsample the merged frame")
+    parser.add_argument("--n-estimators", type=int, default=50)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 1024])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,66 @@
+# src/bench_forest_engine.py
+"""
+Benchmark FlatForest / CompiledPipeline against sklearn's pipeline.predict.
+
+Usage:
+    python src/bench_forest_engine.py --users data/users.csv --flights data/flights.csv --hotels data/hotels.csv
+"""
+import argparse
+import json
+import time
+
+import joblib
+import numpy as np
+
+from forest_engine import CompiledPipeline
+from preprocess import prepare_dataset
+
+
+def time_call(fn, repeat):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000.0
+
+
+def main(args):
+    pipeline = joblib.load(args.model)
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+    with open(args.columns, "r") as f:
+        columns_info = json.load(f)
+    columns = columns_info["num_cols"] + columns_info["cat_cols"]
+
+    df = prepare_dataset(args.users, args.flights, args.hotels)
+    rows = df[columns].sample(n=max(args.batch_sizes), replace=True, random_state=42).reset_index(drop=True)
+
+    print(f"\n{'batch':>6} | {'sklearn ms':>10} | {'flat ms':>8} | {'speedup':>7} | {'forest-only sk/flat ms':>22} | bit-equal")
+    print("-" * 84)
+    for batch_size in args.batch_sizes:
+        X = rows.iloc[:batch_size]
+        Xt = compiled.preprocessor.transform(X)
+        regressor = pipeline[-1]
+
+        sk_ms = time_call(lambda: pipeline.predict(X), args.repeat)
+        flat_ms = time_call(lambda: compiled.predict(X), args.repeat)
+        sk_forest_ms = time_call(lambda: regressor.predict(Xt), args.repeat)
+        flat_forest_ms = time_call(lambda: compiled.forest.predict(Xt), args.repeat)
+        equal = np.array_equal(pipeline.predict(X), compiled.predict(X))
+
+        print(f"{batch_size:>6} | {sk_ms:>10.3f} | {flat_ms:>8.3f} | {sk_ms / flat_ms:>6.1f}x | "
+              f"{sk_forest_ms:>10.3f} / {flat_forest_ms:<9.3f} | {equal}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="model/voyage_model/1/model.pkl")
+    parser.add_argument("--columns", default="src/columns.json")
+    parser.add_argument("--users", default="data/users.csv")
+    parser.add_argument("--flights", default="data/flights.csv")
+    parser.add_argument("--hotels", default="data/hotels.csv")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 1024])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,56 @@
+# src/bench_name_vectorizer.py
+"""
+Benchmark NameVectorizer.transform_batch against the per-name Python loop (transform_name).
+
+The first names of users_cleaned.csv are tiled up to each batch size. For the chars mode the
+batch output is checked to be identical to stacking transform_name; the hashed n-gram mode is
+timed for comparison.
+
+Usage:
+    python src/bench_name_vectorizer.py --users data/users_cleaned.csv --batch-sizes 1 100 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from name_vectorizer import NameVectorizer
+from schema import read_table
+
+
+def time_call(fn, repeat):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000.0
+
+
+def main(args):
+    first_names = read_table("users", args.users, usecols=["name"])["name"].str.split().str[0].tolist()
+    chars = NameVectorizer()
+    ngrams = NameVectorizer(mode="ngrams", n_features=args.n_features)
+
+    print(f"\nINFO: {len(first_names)} first names in {args.users}")
+    print(f"\n{'batch':>7} | {'loop ms':>9} | {'batch ms':>9} | {'speedup':>7} | {'ngrams ms':>9} | identical")
+    print("-" * 66)
+    for batch_size in args.batch_sizes:
+        names = [first_names[i % len(first_names)] for i in range(batch_size)]
+        loop_ms = time_call(lambda: np.array([chars.transform_name(n) for n in names]), args.repeat)
+        batch_ms = time_call(lambda: chars.transform_batch(names), args.repeat)
+        ngram_ms = time_call(lambda: ngrams.transform_batch(names), args.repeat)
+        identical = np.array_equal(np.array([chars.transform_name(n) for n in names]), chars.transform_batch(names))
+        print(f"{batch_size:>7} | {loop_ms:>9.3f} | {batch_ms:>9.3f} | {loop_ms / batch_ms:>6.1f}x | "
+              f"{ngram_ms:>9.3f} | {identical}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="data/users_cleaned.csv")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 900, 10000, 100000])
+    parser.add_argument("--n-features", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,70 @@
+# src/bench_recommender_startup.py
+"""
+Startup benchmark for recommender_api: starts it under uvicorn and measures, from process spawn,
+the time until /health (liveness), /ready (readiness) and the first /recommend response byte.
+
+Usage:
+    python src/bench_recommender_startup.py --runs 3 [--background-load]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+
+def wait_for(url, start, timeout):
+    """Seconds from `start` until `url` answers 200."""
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read(1)
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def run_once(args):
+    env = dict(os.environ, RECOMMENDER_BACKGROUND_LOAD="1" if args.background_load else "0")
+    base = f"http://127.0.0.1:{args.port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "recommender_api:app", "--app-dir", "src",
+         "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        health = wait_for(f"{base}/health", start, args.timeout)
+        ready = wait_for(f"{base}/ready", start, args.timeout)
+        first = wait_for(f"{base}/recommend?user_id={args.user_id}", start, args.timeout)
+        return health, ready, first
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(args):
+    results = np.array([run_once(args) for _ in range(args.runs)]) * 1000.0
+    mode = "background load" if args.background_load else "blocking load"
+    print(f"\nrecommender_api startup ({mode}, {args.runs} runs, median ms from spawn)")
+    for name, column in zip(("/health", "/ready", "first /recommend byte"), results.T):
+        print(f"{name:>22}: {np.median(column):8.1f}  (min {column.min():.1f}, max {column.max():.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--user-id", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--background-load", action="store_true")
+    args = parser.parse_args()
+    main(args)
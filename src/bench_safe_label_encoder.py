@@ -0,0 +1,92 @@
+# src/bench_safe_label_encoder.py
+"""
+Benchmark SafeLabelEncoder.transform against the previous per-element implementation
+(one LabelEncoder.transform call per value), on the users columns encoded by create_encoders.py.
+
+Each column is tiled up to the batch size with a fraction of unseen values mixed in; the outputs
+of both implementations are checked to be identical. Also compares the stored size and load
+time of pickled encoders with the .npz written by save_encoders.
+
+Usage:
+    python src/bench_safe_label_encoder.py --users data/users_cleaned.csv --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from safe_label_encoder import SafeLabelEncoder, load_encoders, save_encoders
+from schema import read_table
+
+
+def legacy_transform(encoder, X):
+    """SafeLabelEncoder.transform before vectorization."""
+    X = np.array(X)
+    seen = set(encoder.classes_)
+    output = []
+    for item in X:
+        if item in seen:
+            output.append(LabelEncoder.transform(encoder, [item])[0])
+        else:
+            output.append(-1)
+    return np.array(output)
+
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000.0
+
+
+def main(args):
+    users = read_table("users", args.users, usecols=["name", "company", "gender"])
+    encoders = {column: SafeLabelEncoder().fit(users[column]) for column in ("name", "company", "gender")}
+    rng = np.random.default_rng(42)
+
+    print(f"\n{'column':>8} | {'size':>7} | {'legacy ms':>10} | {'vectorized ms':>13} | {'speedup':>8} | identical")
+    print("-" * 70)
+    for column, encoder in encoders.items():
+        values = np.asarray(users[column].astype(object))
+        for size in args.sizes:
+            X = values[rng.integers(len(values), size=size)].copy()
+            X[rng.random(size) < args.unknown_fraction] = "__unseen__"
+            legacy_ms = time_call(lambda: legacy_transform(encoder, X), args.repeat)
+            fast_ms = time_call(lambda: encoder.transform(X), args.repeat)
+            identical = np.array_equal(legacy_transform(encoder, X), encoder.transform(X))
+            print(f"{column:>8} | {size:>7} | {legacy_ms:>10.2f} | {fast_ms:>13.3f} | {legacy_ms / fast_ms:>7.0f}x | {identical}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickles = [os.path.join(tmp, f"{column}_encoder.pkl") for column in encoders]
+        for path, encoder in zip(pickles, encoders.values()):
+            with open(path, "wb") as f:
+                pickle.dump(encoder, f)
+        npz = os.path.join(tmp, "label_encoders.npz")
+        save_encoders(npz, encoders)
+
+        def load_pickles():
+            for path in pickles:
+                with open(path, "rb") as f:
+                    pickle.load(f)
+
+        pickle_ms = time_call(load_pickles, args.repeat)
+        npz_ms = time_call(lambda: load_encoders(npz), args.repeat)
+        pickle_kb = sum(os.path.getsize(p) for p in pickles) / 1024
+        print(f"\nINFO: pickles: {pickle_kb:.1f} KB, load {pickle_ms:.2f} ms | "
+              f"npz: {os.path.getsize(npz) / 1024:.1f} KB, load {npz_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="data/users_cleaned.csv")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--unknown-fraction", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args)
@@ -1,30 +1,23 @@
-import pandas as pd
 import os
-import pickle
-from sklearn.preprocessing import LabelEncoder
+from safe_label_encoder import SafeLabelEncoder, save_encoders
+from schema import read_table
 
 # Load data
-data = pd.read_csv("data/users_cleaned.csv")[["name", "company", "gender"]]
+data = read_table("users", "data/users_cleaned.csv", usecols=["name", "company", "gender"])
 
-# Create encoders
-le_name = LabelEncoder()
-le_company = LabelEncoder()
-le_gender = LabelEncoder()
+# Create encoders (unseen values -> -1 at transform time)
+encoders = {column: SafeLabelEncoder() for column in ("name", "company", "gender")}
 
 # Fit encoders
-data["name_encoded"] = le_name.fit_transform(data["name"])
-data["company_encoded"] = le_company.fit_transform(data["company"])
-data["gender_encoded"] = le_gender.fit_transform(data["gender"])
+for column, encoder in encoders.items():
+    data[f"{column}_encoded"] = encoder.fit_transform(data[column])
 
 # Create folder if not exists
 os.makedirs("encoders", exist_ok=True)
 
-# Save encoders
-pickle.dump(le_name, open("encoders/name_encoder.pkl", "wb"))
-pickle.dump(le_company, open("encoders/company_encoder.pkl", "wb"))
-pickle.dump(le_gender, open("encoders/gender_encoder.pkl", "wb"))
+# Save encoders: one classes array per column, loadable with safe_label_encoder.load_encoders
+# (no pickles; gender_encoder.pkl is the gender map written by train_gender_classifier.py)
+save_encoders("encoders/label_encoders.npz", encoders)
 
 print("\n✔ Encoders saved successfully!")
-print("📁 encoders/name_encoder.pkl")
-print("📁 encoders/company_encoder.pkl")
-print("📁 encoders/gender_encoder.pkl")
+print("📁 encoders/label_encoders.npz (" + ", ".join(f"{c}: {len(e.classes_)} classes" for c, e in encoders.items()) + ")")
@@ -0,0 +1,247 @@
+# src/evaluate_recommender.py
+"""
+Offline evaluation of the recommender.
+
+eval:  time-based leave-last-out split (each user's latest flight and latest hotel booking
+       are held out), train each engine on the rest, and report precision@k, recall@k,
+       NDCG@k and coverage@k overall and per item type.
+bench: requests/sec and p50/p95/p99 latency of recommender_api.recommend() for several
+       top_k values, on synthetic catalogues of several sizes and on the trained artifacts.
+
+Results are printed and, unless --no-mlflow is given, logged to MLflow.
+
+Usage:
+    python src/evaluate_recommender.py eval --flights data/flights.csv --hotels data/hotels.csv --engine svd als
+    python src/evaluate_recommender.py bench --catalogue-sizes 1000 10000 100000 --top-k 5 20 100
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from interaction_weights import WEIGHTINGS, RecencyClock, weight_interactions
+from recommender_metrics import ranking_metrics
+from schema import read_table
+from train_recommender import (
+    ENGINES, FLIGHT_KEYS, FLIGHT_SPEND, HOTEL_KEYS, HOTEL_SPEND, fit_engine,
+)
+
+# --------------------------------------------------------
+# Data + time-based split
+# --------------------------------------------------------
+
+def load_bookings(flights_path, hotels_path):
+    """
+    One row per booking with integer user/item codes (items: flights first, then hotels).
+    Returns (frame with user/item/spend/day/is_flight columns, n_items, n_flight_items).
+    """
+    parts, n_items = [], 0
+    for table, path, keys, spend_col, is_flight in (("flights", flights_path, FLIGHT_KEYS, FLIGHT_SPEND, True),
+                                                    ("hotels", hotels_path, HOTEL_KEYS, HOTEL_SPEND, False)):
+        df = read_table(table, path, usecols=["userCode", spend_col, "date"] + keys).dropna()
+        item = df.groupby(keys, sort=False, observed=True).ngroup().to_numpy()
+        parts.append(pd.DataFrame({
+            "userCode": df["userCode"].to_numpy(),
+            "item": item + n_items,
+            "spend": df[spend_col].to_numpy(np.float64),
+            "day": df["date"].to_numpy().astype("datetime64[D]").astype(np.int64),
+            "is_flight": is_flight,
+        }))
+        if is_flight:
+            n_flight_items = int(item.max()) + 1 if len(item) else 0
+        n_items += int(item.max()) + 1 if len(item) else 0
+
+    bookings = pd.concat(parts, ignore_index=True)
+    bookings["user"] = pd.factorize(bookings["userCode"])[0]
+    return bookings, n_items, n_flight_items
+
+def leave_last_out(bookings):
+    """Boolean test mask: bookings on each user's latest date, separately for flights and hotels."""
+    last_day = bookings.groupby(["user", "is_flight"])["day"].transform("max")
+    return (bookings["day"] == last_day).to_numpy()
+
+def build_matrices(bookings, is_test, n_items, weighting, half_life_days):
+    """(weighted train matrix, binary test matrix), both users x items."""
+    shape = (int(bookings["user"].max()) + 1, n_items)
+    train = bookings[~is_test]
+    clock = RecencyClock(half_life_days)
+    aggregates = {
+        "count": np.ones(len(train)),
+        "spend": train["spend"].to_numpy(),
+        "recency": clock.weights(train["day"].to_numpy()),
+    }
+    train_matrix = weight_interactions(train["user"].to_numpy(), train["item"].to_numpy(), aggregates,
+                                       shape, scheme=weighting, recency_scale=clock.scale())
+    test = bookings[is_test]
+    test_matrix = csr_matrix((np.ones(len(test)), (test["user"].to_numpy(), test["item"].to_numpy())), shape=shape)
+    test_matrix.sum_duplicates()
+    return train_matrix, test_matrix
+
+def mlflow_name(metric):
+    # MLflow metric names cannot contain "@"
+    return metric.replace("@", "_at_")
+
+# --------------------------------------------------------
+# Ranking quality
+# --------------------------------------------------------
+
+def run_eval(args):
+    print("\nLoading bookings...")
+    bookings, n_items, n_flight_items = load_bookings(args.flights, args.hotels)
+    is_test = leave_last_out(bookings)
+    train, test = build_matrices(bookings, is_test, n_items, args.weighting, args.half_life_days)
+    print(f"Bookings: {len(bookings)} (train {int((~is_test).sum())}, test {int(is_test.sum())}), "
+          f"users: {train.shape[0]}, items: {n_items}")
+
+    partitions = {"all": np.arange(n_items), "flight": np.arange(n_flight_items),
+                  "hotel": np.arange(n_flight_items, n_items)}
+    results = {}
+    for engine in args.engine:
+        start = time.perf_counter()
+        user_factors, item_factors, _, _ = fit_engine(engine, train, args)
+        train_seconds = time.perf_counter() - start
+
+        metrics = {"train_seconds": train_seconds}
+        start = time.perf_counter()
+        for name, items in partitions.items():
+            part = ranking_metrics(user_factors, item_factors[items], train[:, items], test[:, items],
+                                   k=args.k, exclude_seen=args.exclude_seen)
+            metrics.update({f"{name}/{metric}": value for metric, value in part.items()})
+        metrics["eval_seconds"] = time.perf_counter() - start
+        results[engine] = metrics
+
+        print(f"\n[{engine}] trained in {train_seconds:.2f}s, evaluated in {metrics['eval_seconds']:.2f}s")
+        for name in partitions:
+            scores = ", ".join(f"{m.split('/')[1]}={v:.4f}" for m, v in metrics.items()
+                               if m.startswith(name + "/") and "@" in m)
+            print(f"  {name:6s} ({metrics[name + '/users']} users): {scores}")
+
+    if not args.no_mlflow:
+        from mlflow_utils import configure_mlflow, start_run
+        import mlflow
+
+        configure_mlflow(args.experiment, args.tracking_uri)
+        for engine, metrics in results.items():
+            with start_run(run_name=f"recommender_eval_{engine}"):
+                mlflow.log_params({
+                    "engine": engine, "weighting": args.weighting, "factors": args.factors,
+                    "split": "leave_last_out", "exclude_seen": args.exclude_seen,
+                    "n_users": train.shape[0], "n_items": n_items,
+                })
+                mlflow.log_metrics({mlflow_name(m): float(v) for m, v in metrics.items()})
+        print("[INFO] Evaluation logged to MLflow")
+    return results
+
+# --------------------------------------------------------
+# Serving latency / throughput
+# --------------------------------------------------------
+
+def synthetic_artifacts(n_items, n_users=1000, n_factors=50, random_state=42):
+    """RecommenderArtifacts over random factors; half flights, half hotels."""
+    import recommender_api as rec
+    from ann_index import IVFIndex
+    from fold_in import FoldInStore
+
+    rng = np.random.default_rng(random_state)
+    artifacts = rec.RecommenderArtifacts(
+        user_embeddings=rng.normal(size=(n_users, n_factors)).astype(np.float32),
+        item_embeddings=rng.normal(size=(n_items, n_factors)).astype(np.float32),
+        user_ids=np.arange(n_users, dtype=np.int64),
+        item_list=np.array([f"item {i:09d}" for i in range(n_items)]),
+    )
+    is_flight = np.arange(n_items) < n_items // 2
+    for item_type, mask in (("flight", is_flight), ("hotel", ~is_flight)):
+        artifacts.partition_items[item_type] = np.flatnonzero(mask)
+        artifacts.partition_factors[item_type] = np.ascontiguousarray(artifacts.item_embeddings[mask])
+        if mask.sum() >= rec.ANN_MIN_ITEMS:
+            artifacts.item_index[item_type] = IVFIndex.build(artifacts.partition_factors[item_type])
+    artifacts.fold_in = FoldInStore(artifacts.item_embeddings, artifacts.item_list, artifacts.trained_vector,
+                                    n_base_users=n_users)
+    return artifacts
+
+def time_recommend(artifacts, top_k, exact, n_requests, random_state=42):
+    """Latencies (ms) of n_requests direct recommend() calls for random known users."""
+    import recommender_api as rec
+
+    rec.artifacts = artifacts
+    user_ids = np.random.default_rng(random_state).choice(np.asarray(artifacts.user_ids), n_requests)
+    rec.recommend(user_id=int(user_ids[0]), top_k=top_k, exact=exact)  # warm-up
+    latencies = np.empty(n_requests)
+    for i, user_id in enumerate(user_ids):
+        start = time.perf_counter()
+        rec.recommend(user_id=int(user_id), top_k=top_k, exact=exact)
+        latencies[i] = (time.perf_counter() - start) * 1000.0
+    return latencies
+
+def run_bench(args):
+    import recommender_api as rec
+
+    catalogues = [(f"synthetic_{n}", lambda n=n: synthetic_artifacts(n, n_factors=args.factors))
+                  for n in args.catalogue_sizes]
+    if args.models_dir:
+        catalogues.append(("trained", lambda: rec.RecommenderArtifacts.load(args.models_dir)))
+
+    results = {}
+    print(f"\n{'catalogue':>20} {'items':>8} {'top_k':>6} {'mode':>6} {'req/s':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, build in catalogues:
+        artifacts = build()
+        modes = ["exact"] + (["ann"] if artifacts.item_index else [])
+        for top_k in args.top_k:
+            for mode in modes:
+                latencies = time_recommend(artifacts, top_k, mode == "exact", args.requests)
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                rps = len(latencies) / (latencies.sum() / 1000.0)
+                results[f"{name}/k{top_k}/{mode}"] = {"rps": rps, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+                print(f"{name:>20} {len(artifacts.item_list):>8} {top_k:>6} {mode:>6} {rps:>10.0f} "
+                      f"{p50:>8.3f} {p95:>8.3f} {p99:>8.3f}")
+
+    if not args.no_mlflow:
+        from mlflow_utils import configure_mlflow, start_run
+        import mlflow
+
+        configure_mlflow(args.experiment, args.tracking_uri)
+        with start_run(run_name="recommender_bench"):
+            mlflow.log_params({"requests": args.requests, "factors": args.factors,
+                               "ann_min_items": rec.ANN_MIN_ITEMS, "ann_nprobe": rec.ANN_NPROBE})
+            mlflow.log_metrics({f"{key}/{metric}": float(value)
+                                for key, values in results.items() for metric, value in values.items()})
+        print("[INFO] Benchmark logged to MLflow")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate and benchmark the recommender")
+    parser.add_argument("--no-mlflow", action="store_true", help="only print results")
+    parser.add_argument("--experiment", default="voyage_recommender_eval")
+    parser.add_argument("--tracking-uri", default=None)
+    parser.add_argument("--factors", type=int, default=50)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    ev = sub.add_parser("eval", help="ranking metrics on a leave-last-out split")
+    ev.add_argument("--flights", default="data/flights.csv")
+    ev.add_argument("--hotels", default="data/hotels.csv")
+    ev.add_argument("--engine", nargs="+", choices=ENGINES, default=list(ENGINES))
+    ev.add_argument("--weighting", choices=WEIGHTINGS, default="count")
+    ev.add_argument("--half-life-days", type=float, default=180.0)
+    ev.add_argument("--k", type=int, nargs="+", default=[5, 10, 20])
+    ev.add_argument("--exclude-seen", action="store_true",
+                    help="drop already-booked items from rankings (the API does not)")
+    ev.add_argument("--als-reg", type=float, default=0.1)
+    ev.add_argument("--als-alpha", type=float, default=40.0)
+    ev.add_argument("--als-iterations", type=int, default=15)
+    ev.add_argument("--threads", type=int, default=None)
+
+    bench = sub.add_parser("bench", help="recommend() throughput and latency percentiles")
+    bench.add_argument("--catalogue-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    bench.add_argument("--top-k", type=int, nargs="+", default=[5, 20, 100])
+    bench.add_argument("--requests", type=int, default=2000)
+    bench.add_argument("--models-dir", default=None, help="also benchmark the trained artifacts in this directory")
+
+    args = parser.parse_args()
+    if args.mode == "eval":
+        run_eval(args)
+    else:
+        run_bench(args)
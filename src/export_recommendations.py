@@ -0,0 +1,33 @@
+# src/export_recommendations.py
+"""
+Precompute recommendations for every known user (e.g. for email campaigns) and write them as NDJSON.
+
+Usage:
+    python src/export_recommendations.py --out recommendations.ndjson --top-k 5
+"""
+import argparse
+import json
+import time
+
+import recommender_api as rec
+
+
+def main(args):
+    artifacts = rec.load_artifacts()
+    user_ids = [int(u) for u in artifacts.user_ids]
+    print(f"INFO: Exporting top-{args.top_k} recommendations for {len(user_ids)} users to {args.out}")
+    start = time.perf_counter()
+    with open(args.out, "w", encoding="utf-8") as f:
+        for row in rec.iter_batch_recommendations(user_ids, args.top_k, args.item_type):
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    elapsed = time.perf_counter() - start
+    print(f"INFO: Wrote {len(user_ids)} rows in {elapsed:.2f}s ({len(user_ids) / max(elapsed, 1e-9):.0f} users/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="recommendations.ndjson")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--item-type", choices=["flight", "hotel"], default=None)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,101 @@
+# src/feature_assembler.py
+import json
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+DATE_PREFIXES = ("date_flight", "date_hotel")
+
+
+def parse_date(value):
+    """Parse a date value, using the ISO fast path before falling back to pandas."""
+    if isinstance(value, (date, datetime)):
+        return value
+    if isinstance(value, str) and len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            pass
+    return pd.to_datetime(value)
+
+
+class FeatureAssembler:
+    """
+    Maps incoming JSON records straight into the column order the pipeline expects.
+    - Built once from columns.json (num_cols + cat_cols).
+    - Numeric columns go into preallocated float64 slots (missing -> NaN).
+    - Categorical columns go into preallocated object slots (missing -> None).
+    - date_flight / date_hotel strings are split into <prefix>_year/_month/_day.
+    Works the same for one record or a whole batch.
+    """
+
+    def __init__(self, num_cols, cat_cols, date_prefixes=DATE_PREFIXES):
+        self.num_cols = list(num_cols)
+        self.cat_cols = list(cat_cols)
+        self.columns = self.num_cols + self.cat_cols
+        self.date_prefixes = tuple(date_prefixes)
+        self._num_pos = {c: i for i, c in enumerate(self.num_cols)}
+        self._cat_pos = {c: i for i, c in enumerate(self.cat_cols)}
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, "r") as f:
+            columns_info = json.load(f)
+        return cls(columns_info.get("num_cols", []), columns_info.get("cat_cols", []))
+
+    def _expand_dates(self, record):
+        """Return the record with date prefixes replaced by year/month/day fields."""
+        if not any(record.get(prefix) for prefix in self.date_prefixes):
+            return record
+        record = dict(record)
+        for prefix in self.date_prefixes:
+            if prefix in record and record[prefix]:
+                dt = parse_date(record.pop(prefix))
+                record[f"{prefix}_year"] = int(dt.year)
+                record[f"{prefix}_month"] = int(dt.month)
+                record[f"{prefix}_day"] = int(dt.day)
+        return record
+
+    def assemble(self, records):
+        """
+        Build the feature frame for a list of records.
+        Returns (X, kept, errors):
+        - X: DataFrame with `self.columns`, one row per kept record.
+        - kept: input positions of the rows in X.
+        - errors: {input position: message} for records that could not be assembled.
+        """
+        n = len(records)
+        num = np.full((len(self.num_cols), n), np.nan, dtype=np.float64)
+        cat = np.full((len(self.cat_cols), n), None, dtype=object)
+        ok = np.ones(n, dtype=bool)
+        errors = {}
+
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors[i] = "Record must be a JSON object"
+                ok[i] = False
+                continue
+            try:
+                record = self._expand_dates(record)
+                for key, value in record.items():
+                    pos = self._num_pos.get(key)
+                    if pos is not None:
+                        if value is not None:
+                            num[pos, i] = float(value)
+                        continue
+                    pos = self._cat_pos.get(key)
+                    if pos is not None:
+                        cat[pos, i] = value
+            except Exception as e:
+                errors[i] = str(e)
+                ok[i] = False
+
+        kept = np.flatnonzero(ok)
+        if errors:
+            num, cat = num[:, kept], cat[:, kept]
+
+        data = {c: num[j] for j, c in enumerate(self.num_cols)}
+        data.update({c: cat[j] for j, c in enumerate(self.cat_cols)})
+        X = pd.DataFrame(data, columns=self.columns, copy=False)
+        return X, kept.tolist(), errors
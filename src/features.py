@@ -1,18 +1,27 @@
 # src/features.py
+import numpy as np
 import pandas as pd
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 
-def prepare_X_y(df, target="price", top_k=50):
+ENCODINGS = ("onehot", "sparse", "ordinal")
+
+def prepare_X_y(df, target="price", top_k=50, encoding="onehot"):
     """
     Prepares features (X), target (y), and a ColumnTransformer preprocessor.
     - Drops rows missing target.
     - Drops id-like categorical columns (userCode, travelCode, code, etc.)
     - Limits categories per categorical column to top_k (others -> "OTHER").
+    - encoding: "onehot" (dense one-hot), "sparse" (CSR one-hot, same model inputs in ~1/5 of the memory)
+      or "ordinal" (one integer code per categorical column, for estimators with native
+      categorical support; see categorical_mask).
     - Returns X, y, preprocessor, num_cols, cat_cols.
     """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding '{encoding}', expected one of {ENCODINGS}")
+
     # Drop rows where target is missing
     df = df.dropna(subset=[target])
 
@@ -22,7 +31,7 @@ def prepare_X_y(df, target="price", top_k=50):
 
     # Detect categorical and numeric columns
     cat_cols = X.select_dtypes(include=["object", "category"]).columns.tolist()
-    num_cols = X.select_dtypes(include=["int64", "float64", "float32", "int32"]).columns.tolist()
+    num_cols = X.select_dtypes(include="number").columns.tolist()
 
     # ✅ Drop ID-like columns (they don’t carry predictive info)
     drop_cols = [c for c in X.columns if any(k in c.lower() for k in ("id", "code"))]
@@ -37,6 +46,8 @@ def prepare_X_y(df, target="price", top_k=50):
         if c not in X.columns:
             continue
         top_values = X[c].value_counts().nlargest(top_k).index
+        if isinstance(X[c].dtype, pd.CategoricalDtype) and "OTHER" not in X[c].cat.categories:
+            X[c] = X[c].cat.add_categories("OTHER")
         X[c] = X[c].where(X[c].isin(top_values), other="OTHER")
 
     # Numeric pipeline
@@ -46,9 +57,14 @@ def prepare_X_y(df, target="price", top_k=50):
     ])
 
     # Categorical pipeline
+    if encoding == "ordinal":
+        # Unseen categories -> -1, which HistGradientBoosting treats as missing
+        encoder = OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1)
+    else:
+        encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=encoding == "sparse")
     categorical_transformer = Pipeline(steps=[
         ("imputer", SimpleImputer(strategy="most_frequent")),
-        ("encoder", OneHotEncoder(handle_unknown="ignore", sparse_output=False))
+        ("encoder", encoder)
     ])
 
     preprocessor = ColumnTransformer(
@@ -57,7 +73,20 @@ def prepare_X_y(df, target="price", top_k=50):
             ("cat", categorical_transformer, cat_cols),
         ],
         remainder="drop",
-        sparse_threshold=0.3
+        # sparse: always return CSR, even if the numeric block makes it fairly dense
+        sparse_threshold=1.0 if encoding == "sparse" else 0.3
     )
 
-    return X, y, preprocessor, num_cols, cat_cols
\ No newline at end of file
+    return X, y, preprocessor, num_cols, cat_cols
+
+def limit_categories(X, keep):
+    """Same rare-category mapping as prepare_X_y, with the categories kept on the fitting rows."""
+    for c, values in keep.items():
+        if isinstance(X[c].dtype, pd.CategoricalDtype) and "OTHER" not in X[c].cat.categories:
+            X[c] = X[c].cat.add_categories("OTHER")
+        X[c] = X[c].where(X[c].isin(values), other="OTHER")
+    return X
+
+def categorical_mask(num_cols, cat_cols):
+    """Boolean mask of categorical columns in the preprocessor output (numeric first, then categorical)."""
+    return np.array([False] * len(num_cols) + [True] * len(cat_cols))
\ No newline at end of file
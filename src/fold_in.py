@@ -0,0 +1,241 @@
+# src/fold_in.py
+import os
+import json
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from interaction_weights import FoldInWeighting
+from schema import DATE_FORMAT
+
+
+def item_key(event):
+    """Catalogue item string for an interaction event, in the train_recommender.build_items format."""
+    if event.get("item"):
+        return event["item"]
+    if event.get("type") == "flight" or "flightType" in event:
+        return f"{event['from']} → {event['to']} — {event['flightType']}"
+    if event.get("type") == "hotel" or "place" in event:
+        return f"{event['name']} — {event['place']}"
+    raise ValueError("Event needs 'item', flight fields (from/to/flightType) or hotel fields (name/place)")
+
+
+def event_spend(event):
+    """Spend of a booking as at training time: 'spend', else 'total', else 'price' (x 'days'); None if absent."""
+    for key in ("spend", "total"):
+        if event.get(key) is not None:
+            return float(event[key])
+    if event.get("price") is not None:
+        return float(event["price"]) * float(event.get("days", 1))
+    return None
+
+
+def event_day(event):
+    """Booking date (the datasets' MM/DD/YYYY or ISO) as days since epoch, None if the event has no 'date'."""
+    if event.get("date") is None:
+        return None
+    date = str(event["date"])
+    try:
+        day = datetime.strptime(date, DATE_FORMAT).date()
+    except ValueError:
+        day = datetime.fromisoformat(date).date()
+    return int(np.datetime64(day, "D").astype(np.int64))
+
+
+class FoldInStore:
+    """
+    Serves users who booked since the last SVD training, without retraining.
+
+    TruncatedSVD.transform is linear (x @ components_.T), so a user's embedding after
+    new interactions is their trained embedding plus the new interaction row projected
+    onto the existing item factors. Engines whose fold-in is a different linear map (ALS)
+    pass it as `projection`. New users start from zero.
+
+    The row is weighted like the training matrix (`weighting`, saved by train_recommender.py):
+    per user and item the store keeps booking counts, spend and recency sums of the new
+    events and re-weights the whole row when it changes. An explicit event "weight" is
+    added to the row as is, on the scale of the trained matrix.
+
+    Some schemes are not additive (log_spend, bm25 saturation and length norm): a user's
+    new bookings weigh differently on top of their trained bookings than on their own.
+    `base_totals(user_id)` gives a trained user's per-item totals, (item indices,
+    [bookings, spend, recency] rows) or None; the store then re-weights the merged row and
+    folds in its change, which matches refolding the full row. Without it (artifacts older
+    than interaction_totals.npz) trained users get the new events weighted on their own,
+    an approximation that drift() reports as "refold": "new_events_only".
+
+    Events are appended to an NDJSON log and applied by replaying it, so every worker
+    sharing the log converges on the same overlay and restarts keep folded-in users.
+    Each event is tagged with `run_id`, the training run whose factors it was folded onto;
+    events from other runs are skipped on replay, since a retrain already includes them.
+    Drift metrics tell when the existing factors stop explaining new behaviour and a
+    full retrain is due.
+    """
+
+    def __init__(self, item_factors, item_names, base_vector, log_path=None, projection=None, run_id=None,
+                 weighting=None, base_totals=None, max_unknown_item_rate=0.05, max_residual=0.5,
+                 max_folded_fraction=0.1, n_base_users=0):
+        self.item_factors = np.asarray(item_factors, dtype=np.float64)
+        self.projection = self.item_factors if projection is None else np.asarray(projection, dtype=np.float64)
+        self.gram = self.item_factors.T @ self.item_factors
+        self.item_names = np.asarray(item_names)
+        self.base_vector = base_vector  # user_id -> trained embedding or None
+        self.log_path = log_path
+        self.run_id = run_id
+        self.weighting = FoldInWeighting() if weighting is None else weighting
+        self.base_totals = base_totals  # user_id -> (trained item indices, their totals) or None
+        self.max_unknown_item_rate = max_unknown_item_rate
+        self.max_residual = max_residual
+        self.max_folded_fraction = max_folded_fraction
+        self.n_base_users = n_base_users
+
+        self.vectors = {}
+        self.rows = {}  # user_id -> {item index: [bookings, spend, recency sum, explicit weight]}
+        self.residuals = {}  # user_id -> share of the folded-in row the factors cannot reconstruct
+        self.new_users = set()
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._stats = {"events": 0, "unknown_items": 0, "stale_events": 0}
+        self.sync()
+
+    def item_index(self, key):
+        pos = int(np.searchsorted(self.item_names, key))
+        if pos < len(self.item_names) and self.item_names[pos] == key:
+            return pos
+        return None
+
+    def vector(self, user_id):
+        return self.vectors.get(user_id)
+
+    def add_events(self, events):
+        """Validate events, append them to the log and apply them. Returns a per-call summary."""
+        records, errors = [], []
+        for i, event in enumerate(events):
+            try:
+                record = {"user_id": int(event["user_id"]), "item": item_key(event), "run_id": self.run_id}
+                if event.get("weight") is not None:
+                    record["weight"] = float(event["weight"])
+                else:
+                    record["spend"] = event_spend(event)
+                    record["day"] = event_day(event)
+                    if record["spend"] is None and self.weighting.needs_spend:
+                        raise ValueError(f"The {self.weighting.scheme} weighting needs the booking's spend "
+                                         "('price', 'total' or 'spend') or an explicit 'weight'")
+                records.append(record)
+            except (KeyError, TypeError, ValueError) as e:
+                errors.append({"index": i, "error": str(e)})
+
+        if self.log_path:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                # One write per call keeps lines from concurrent workers from interleaving
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            applied = self.sync()
+        else:
+            with self._lock:
+                applied = self._apply(records)
+        applied["errors"] = errors
+        return applied
+
+    def sync(self):
+        """Apply events other workers (or earlier runs) appended to the log since the last sync."""
+        if not self.log_path or not os.path.exists(self.log_path):
+            return {"applied": 0, "unknown_items": 0, "users": []}
+        with self._lock:
+            if os.path.getsize(self.log_path) <= self._offset:
+                return {"applied": 0, "unknown_items": 0, "users": []}
+            with open(self.log_path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            complete = chunk[:chunk.rfind(b"\n") + 1]  # leave a partially written last line for later
+            self._offset += len(complete)
+            records = [json.loads(line) for line in complete.decode("utf-8").splitlines() if line.strip()]
+            return self._apply(records)
+
+    def _apply(self, records):
+        """Accumulate events per user and item, then re-fold each affected user's weighted row."""
+        touched = set()
+        unknown = stale = 0
+        for record in records:
+            if record.get("run_id") != self.run_id:
+                stale += 1  # folded onto an earlier training run, which this one has retrained on
+                continue
+            idx = self.item_index(record["item"])
+            if idx is None:
+                unknown += 1
+                continue
+            user_id = record["user_id"]
+            totals = self.rows.setdefault(user_id, {}).setdefault(idx, np.zeros(4))
+            if record.get("weight") is not None:
+                totals[3] += record["weight"]
+            else:
+                totals[0] += 1.0
+                totals[1] += record.get("spend") or 0.0
+                totals[2] += self.weighting.decay(record.get("day"))
+            touched.add(user_id)
+
+        for user_id in touched:
+            row = self.rows[user_id]
+            new_items = np.fromiter(row.keys(), dtype=np.int64)
+            new_totals = np.array(list(row.values()))
+            trained = self.base_totals(user_id) if self.base_totals is not None else None
+            if trained is None:
+                trained = (np.zeros(0, dtype=np.int64), np.zeros((0, 3)))
+            trained_items, trained_totals = np.asarray(trained[0], dtype=np.int64), np.asarray(trained[1])
+
+            # weights = change of the user's weighted row: re-weighted merged row minus the trained row
+            items = np.union1d(trained_items, new_items)
+            new_pos = np.searchsorted(items, new_items)
+            trained_pos = np.searchsorted(items, trained_items)
+            merged = np.zeros((len(items), 3))
+            merged[trained_pos] += trained_totals
+            merged[new_pos] += new_totals[:, :3]
+            weights = self.weighting.row(items, merged[:, 0], merged[:, 1], merged[:, 2])
+            weights[trained_pos] -= self.weighting.row(trained_items, *trained_totals.T)
+            weights[new_pos] += new_totals[:, 3]
+            delta = weights @ self.projection[items]
+
+            base = self.base_vector(user_id)
+            if base is None:
+                self.new_users.add(user_id)
+                base = np.zeros(self.item_factors.shape[1])
+            self.vectors[user_id] = np.asarray(base, dtype=np.float64) + delta
+
+            # Share of the folded-in row x the existing latent space cannot reconstruct:
+            # ||x - delta F^T||^2 = ||x||^2 - 2 x.(F delta) + delta^T (F^T F) delta
+            norm_sq = float(weights @ weights)
+            if norm_sq > 0:
+                error_sq = norm_sq - 2.0 * float(weights @ (self.item_factors[items] @ delta)) + float(delta @ self.gram @ delta)
+                self.residuals[user_id] = float(np.sqrt(max(0.0, error_sq / norm_sq)))
+
+        self._stats["events"] += len(records) - stale
+        self._stats["unknown_items"] += unknown
+        self._stats["stale_events"] += stale
+        return {"applied": len(records) - stale - unknown, "unknown_items": unknown, "users": sorted(touched)}
+
+    def drift(self):
+        stats = self._stats
+        unknown_rate = stats["unknown_items"] / stats["events"] if stats["events"] else 0.0
+        mean_residual = float(np.mean(list(self.residuals.values()))) if self.residuals else 0.0
+        folded_fraction = len(self.vectors) / self.n_base_users if self.n_base_users else 0.0
+        reasons = []
+        if unknown_rate > self.max_unknown_item_rate:
+            reasons.append("unknown_item_rate")
+        if mean_residual > self.max_residual:
+            reasons.append("mean_residual")
+        if folded_fraction > self.max_folded_fraction:
+            reasons.append("folded_user_fraction")
+        return {
+            "run_id": self.run_id,
+            "weighting": self.weighting.scheme,
+            "refold": "full_row" if self.base_totals is not None else "new_events_only",
+            "events": stats["events"],
+            "stale_events": stats["stale_events"],
+            "folded_users": len(self.vectors),
+            "new_users": len(self.new_users),
+            "unknown_item_rate": round(unknown_rate, 4),
+            "mean_residual": round(mean_residual, 4),
+            "folded_user_fraction": round(folded_fraction, 4),
+            "retrain_recommended": bool(reasons),
+            "retrain_reasons": reasons,
+        }
@@ -0,0 +1,160 @@
+# src/forest_engine.py
+"""
+Flattened tree-ensemble inference for the price model.
+
+The fitted RandomForestRegressor is packed into contiguous NumPy arrays
+(feature, threshold, left/right child, leaf value for every node of every tree)
+and evaluated for all trees and all rows at once, one tree level per step.
+Results are bit-identical to `pipeline.predict`:
+- inputs are cast to float32 like sklearn's trees, compared against float64 thresholds,
+- NaNs follow each node's missing_go_to_left flag,
+- per-tree outputs are summed in estimator order, then divided by n_estimators.
+
+Usage:
+    python src/forest_engine.py --model model/voyage_model/1/model.pkl --out model/voyage_model/1/forest.npz
+"""
+import argparse
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+TREE_LEAF = -1
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, missing_left, roots, depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.depth = int(depth)
+        self.n_features = int(n_features)
+        self._children_cache = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_forest(cls, forest):
+        """Pack the estimators of a fitted sklearn forest regressor into flat arrays."""
+        features, thresholds, lefts, rights, values, missing, roots = [], [], [], [], [], [], []
+        offset, depth = 0, 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == TREE_LEAF
+            own = np.arange(offset, offset + n)
+
+            # Leaves point to themselves so every tree can take the same number of steps
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+            values.append(tree.value[:, :, 0])
+            if getattr(tree, "missing_go_to_left", None) is not None:
+                missing.append(np.asarray(tree.missing_go_to_left, dtype=bool))
+            else:
+                missing.append(np.zeros(n, dtype=bool))
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            missing_left=np.concatenate(missing),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            n_features=forest.n_features_in_,
+        )
+
+    def save(self, path):
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, missing_left=self.missing_left, roots=self.roots,
+            depth=self.depth, n_features=self.n_features,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def _children(self):
+        # children[2 * node + go_left] -> next node, so one gather replaces a where() over two
+        if self._children_cache is None:
+            self._children_cache = np.stack([self.right, self.left], axis=1).ravel()
+        return self._children_cache
+
+    def apply(self, X):
+        """Leaf index (into the flat arrays) reached by every row in every tree: shape (n_trees, n_rows)."""
+        n_rows = X.shape[0]
+        children = self._children()
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offsets = np.arange(n_rows, dtype=np.intp) * self.n_features
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        has_nan = np.isnan(flat_X).any()
+        for _ in range(self.depth):
+            x = flat_X.take(row_offsets + self.feature.take(nodes))
+            go_left = x <= self.threshold.take(nodes)
+            if has_nan:
+                go_left |= np.isnan(x) & self.missing_left.take(nodes)
+            nodes = children.take(2 * nodes + go_left)
+        return nodes
+
+    def predict(self, X, chunk_size=4096):
+        # Sparse inputs (the "sparse" encoding of features.prepare_X_y) are densified one chunk at a time
+        is_sparse = sparse.issparse(X)
+        X = sparse.csr_matrix(X, dtype=np.float32) if is_sparse else np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X has shape {X.shape}, expected (n_rows, {self.n_features})")
+
+        n_outputs = self.value.shape[1]
+        y_hat = np.zeros((X.shape[0], n_outputs), dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            leaves = self.apply(chunk.toarray() if is_sparse else chunk)
+            out = y_hat[start:start + chunk_size]
+            # Sum tree by tree, in estimator order, to match sklearn's float64 accumulation exactly
+            for tree_leaves in leaves:
+                out += self.value.take(tree_leaves, axis=0)
+        y_hat /= self.n_trees
+        return y_hat[:, 0] if n_outputs == 1 else y_hat
+
+
+class CompiledPipeline:
+    """Drop-in for the fitted Pipeline: sklearn preprocessing + FlatForest for the regressor."""
+
+    def __init__(self, preprocessor, forest):
+        self.preprocessor = preprocessor
+        self.forest = forest
+
+    @classmethod
+    def from_pipeline(cls, pipeline, forest_path=None):
+        """Compile a fitted pipeline; reuse an exported forest.npz when one is given."""
+        forest = FlatForest.load(forest_path) if forest_path else FlatForest.from_forest(pipeline[-1])
+        return cls(pipeline[:-1], forest)
+
+    def predict(self, X):
+        return self.forest.predict(self.preprocessor.transform(X))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a fitted forest pipeline to flat arrays")
+    parser.add_argument("--model", default="model/voyage_model/1/model.pkl")
+    parser.add_argument("--out", default="model/voyage_model/1/forest.npz")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    flat = FlatForest.from_forest(pipeline[-1])
+    flat.save(args.out)
+    print(f"INFO: Exported {flat.n_trees} trees ({len(flat.feature)} nodes, depth {flat.depth}) to {args.out}")
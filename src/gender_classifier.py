@@ -0,0 +1,138 @@
+# src/gender_classifier.py
+"""
+Batch inference for the gender classifier served at /classify/gender.
+
+- The model is read once from a local copy of its MLflow artifact (an MLflow model directory
+  with MLmodel + model.pkl), written by export_model / train_gender_classifier.py,
+- first names are vectorized with one NameVectorizer.transform_batch call per batch, for the
+  names not already in a bounded LRU of name vectors (names repeat heavily),
+- the whole batch goes through one predict_proba call.
+
+Usage (refresh the local copy from a logged run):
+    python src/gender_classifier.py --model-uri runs:/<run_id>/model --out model/gender_classifier
+"""
+import os
+import math
+import pickle
+import shutil
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+from prediction_cache import InMemoryBackend
+
+GENDER_MODEL_DIR = os.getenv("GENDER_MODEL_DIR", "model/gender_classifier")
+GENDER_ENCODERS_DIR = os.getenv("GENDER_ENCODERS_DIR", "encoders")
+
+
+def export_model(model_uri, out_dir=GENDER_MODEL_DIR):
+    """Download an MLflow model (e.g. runs:/<id>/model) into out_dir, replacing the previous copy."""
+    import mlflow
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".gender-", dir=parent)
+    try:
+        local = mlflow.artifacts.download_artifacts(artifact_uri=model_uri, dst_path=tmp_dir)
+        old = f"{out_dir}.old"
+        if os.path.isdir(out_dir):
+            os.replace(out_dir, old)
+        os.replace(local, out_dir)
+        shutil.rmtree(old, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return out_dir
+
+
+def parse_record(record):
+    """(name, age) from {"name": ..., "age": ...} or [name, age]; raises ValueError if unusable."""
+    if isinstance(record, dict):
+        name, age = record.get("name"), record.get("age")
+    elif isinstance(record, (list, tuple)) and len(record) == 2:
+        name, age = record
+    else:
+        raise ValueError('Record must be {"name": ..., "age": ...} or [name, age]')
+    if not isinstance(name, str) or not name.split():
+        raise ValueError("name must be a non-empty string")
+    try:
+        age = float(age)
+    except (TypeError, ValueError):
+        raise ValueError("age must be a number")
+    if not math.isfinite(age):
+        raise ValueError("age must be a finite number")
+    return name, age
+
+
+class GenderClassifier:
+    def __init__(self, model, vectorizer, gender_map, cache_size=10000):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.labels = {v: k for k, v in gender_map.items()}
+        # Name vectors never go stale for a given vectorizer, so entries only leave by LRU eviction
+        self.name_cache = InMemoryBackend(cache_size, ttl=float("inf")) if cache_size > 0 else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, model_dir=GENDER_MODEL_DIR, encoders_dir=GENDER_ENCODERS_DIR, cache_size=10000):
+        if not os.path.exists(os.path.join(model_dir, "MLmodel")):
+            raise FileNotFoundError(f"No MLflow model at {os.path.abspath(model_dir)}")
+        import mlflow.sklearn  # only needed once, at load time
+
+        model = mlflow.sklearn.load_model(model_dir)
+        with open(os.path.join(encoders_dir, "name_vectorizer.pkl"), "rb") as f:
+            vectorizer = pickle.load(f)
+        with open(os.path.join(encoders_dir, "gender_encoder.pkl"), "rb") as f:
+            gender_map = pickle.load(f)
+        return cls(model, vectorizer, gender_map, cache_size)
+
+    def name_vectors(self, first_names):
+        """One vector per first name; only names missing from the cache are vectorized (in one call)."""
+        # The vectorizer lowercases names, so the lowercased name is an exact cache key
+        keys = [name.lower() for name in first_names]
+        if self.name_cache is None:
+            return self.vectorizer.transform_batch(keys)
+
+        vectors = self.name_cache.get_many(keys)
+        missing = sorted({key for key, vector in zip(keys, vectors) if vector is None})
+        n_missing = sum(vector is None for vector in vectors)
+        with self._lock:
+            self.hits += len(keys) - n_missing
+            self.misses += n_missing
+        if missing:
+            # Copies, so cached rows do not keep the whole batch array alive
+            fresh = [row.copy() for row in self.vectorizer.transform_batch(missing)]
+            self.name_cache.set_many(zip(missing, fresh))
+            fresh = dict(zip(missing, fresh))
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.stack(vectors)
+
+    def predict(self, names, ages):
+        """(gender labels, probability of each predicted label) for parallel lists of names and ages."""
+        if not names:
+            return [], np.zeros(0)
+        V = self.name_vectors([name.split()[0] for name in names])
+        X = np.hstack([V, np.asarray(ages, dtype=np.float64).reshape(-1, 1)])
+        proba = self.model.predict_proba(X)
+        best = proba.argmax(axis=1)
+        classes = self.model.classes_
+        return [self.labels[int(classes[i])] for i in best], proba[np.arange(len(best)), best]
+
+    def stats(self):
+        stats = {"loaded": True, "hits": self.hits, "misses": self.misses}
+        if self.name_cache is not None:
+            cache = self.name_cache.stats()
+            cache.pop("ttl")  # infinite, not valid JSON
+            stats["name_cache"] = cache
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy a logged gender model to the local serving directory")
+    parser.add_argument("--model-uri", required=True, help="e.g. runs:/<run_id>/model")
+    parser.add_argument("--out", default=GENDER_MODEL_DIR)
+    args = parser.parse_args()
+    print(f"INFO: Exported {args.model_uri} to {export_model(args.model_uri, args.out)}")
@@ -0,0 +1,204 @@
+# src/hyperparam_search.py
+"""
+Parallel hyperparameter search for the price model.
+
+- The rows are split once into train / validation; the feature preparation (rare-category
+  grouping and the ColumnTransformer) is fitted on the training rows only, so validation
+  scores (and the selection) see the validation rows as unseen data.
+- The transformed matrix is written once to a directory of .npy files in [train | validation]
+  order; worker processes memory-map it, so trials read the training prefix and the validation
+  block as slices instead of receiving a pickled copy of Xt.
+- grid: every candidate is fitted on all training rows.
+- halving: successive halving over the number of training rows; each round keeps the
+  best 1/factor of the candidates (by validation r2) and gives them factor x more rows.
+- Every trial reports fit time, held-out r2/RMSE/MAE and predict latency (one row and a
+  batch, regressor only: the preprocessing cost is the same for every candidate).
+
+Usage (through train_regression.py, which refits the selected candidate on all rows):
+    python src/train_regression.py --prepared data/prepared --search halving --search-workers 4
+"""
+import os
+import time
+import itertools
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import ParameterGrid
+from threadpoolctl import threadpool_limits
+
+from features import limit_categories
+from preprocess_cache import load_matrix, save_matrix
+
+SEARCH_MODES = ("grid", "halving")
+
+SEARCH_SPACES = {
+    "rf": {
+        "n_estimators": [100, 200],
+        "max_depth": [10, 20, None],
+        "min_samples_leaf": [1, 5],
+        "max_features": [1.0, 0.5],
+    },
+    "hgb": {
+        "max_iter": [200, 500],
+        "learning_rate": [0.05, 0.1],
+        "max_leaf_nodes": [31, 63, 127],
+        "l2_regularization": [0.0, 1.0],
+    },
+}
+
+
+def write_shared(df, prepare, out_dir, target="price", validation_fraction=0.2, random_state=42, chunk_rows=65536):
+    """
+    Split df's rows at random into train / validation, fit prepare(train rows) -> (X, y, preprocessor,
+    num_cols, cat_cols) (e.g. features.prepare_X_y) and its preprocessor on the training rows only,
+    then save both splits transformed by it as .npy files under out_dir, in [train | validation] order.
+    Dense output is transformed and written chunk by chunk into a memmap.
+    Returns the number of training rows.
+    """
+    df = df.dropna(subset=[target])
+    n_rows = len(df)
+    order = np.random.default_rng(random_state).permutation(n_rows)
+    n_train = n_rows - int(round(n_rows * validation_fraction))
+    if not 0 < n_train < n_rows:
+        raise ValueError(f"validation_fraction={validation_fraction} leaves no train or validation rows")
+
+    X_train, y_train, preprocessor, num_cols, cat_cols = prepare(df.iloc[order[:n_train]])
+    preprocessor.fit(X_train, y_train)
+    # Validation rows get the rare-category mapping of the training rows (unseen -> "OTHER")
+    keep = {c: pd.Index(X_train[c].unique()) for c in cat_cols}
+    val = df.iloc[order[n_train:]]
+    X_val = limit_categories(val[num_cols + cat_cols].copy(), keep)
+    chunks = (preprocessor.transform(X.iloc[start:start + chunk_rows])
+              for X in (X_train, X_val) for start in range(0, len(X), chunk_rows))
+
+    os.makedirs(out_dir, exist_ok=True)
+    first = next(chunks)
+    if sparse.issparse(first):
+        save_matrix(out_dir, sparse.vstack([first, *chunks], format="csr"))
+    else:
+        out = np.lib.format.open_memmap(os.path.join(out_dir, "Xt.npy"), mode="w+",
+                                        dtype=first.dtype, shape=(n_rows, first.shape[1]))
+        offset = 0
+        for chunk in itertools.chain([first], chunks):
+            out[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        out.flush()
+        del out
+    np.save(os.path.join(out_dir, "y.npy"), np.concatenate([np.asarray(y_train), val[target].to_numpy()]))
+    return n_train
+
+
+# Per-process state, set once by the pool initializer
+_shared = {}
+
+
+def _init_worker(shared_dir, n_train, build, threads):
+    # Parallelism comes from the pool; keep OpenMP/BLAS (e.g. HistGradientBoosting) from oversubscribing
+    threadpool_limits(limits=threads)
+    _shared.update(Xt=load_matrix(shared_dir), y=np.load(os.path.join(shared_dir, "y.npy"), mmap_mode="r"),
+                   n_train=n_train, build=build)
+
+
+def _predict_ms(regressor, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        regressor.predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000.0
+
+
+def run_trial(params, n_rows, latency_batch=1024, latency_repeat=20):
+    """Fit one candidate on the first n_rows training rows and score it on the validation rows."""
+    Xt, y, n_train = _shared["Xt"], _shared["y"], _shared["n_train"]
+    X_val, y_val = Xt[n_train:], y[n_train:]
+    regressor = _shared["build"](params)
+
+    start = time.perf_counter()
+    regressor.fit(Xt[:n_rows], y[:n_rows])
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_hat = regressor.predict(X_val)
+    val_predict_s = time.perf_counter() - start
+    regressor.predict(X_val[:1])  # warm-up
+    return {
+        "params": params,
+        "n_rows": n_rows,
+        "fit_seconds": fit_s,
+        "val_r2": r2_score(y_val, y_hat),
+        "val_rmse": float(np.sqrt(mean_squared_error(y_val, y_hat))),
+        "val_mae": mean_absolute_error(y_val, y_hat),
+        "predict_1_ms": _predict_ms(regressor, X_val[:1], latency_repeat),
+        f"predict_{latency_batch}_ms": _predict_ms(regressor, X_val[:latency_batch], latency_repeat),
+        "val_rows_per_second": X_val.shape[0] / val_predict_s,
+    }
+
+
+def halving_schedule(n_candidates, n_train, factor=3, min_rows=None):
+    """[(candidates kept, training rows)] per round; the last round uses all training rows."""
+    rounds = 1
+    while factor ** rounds < n_candidates:
+        rounds += 1
+    min_rows = min_rows or max(n_train // factor ** (rounds - 1), 1)
+    schedule, kept = [], n_candidates
+    for r in range(rounds):
+        rows = n_train if r == rounds - 1 else min(min_rows * factor ** r, n_train)
+        schedule.append((kept, rows))
+        kept = max(int(np.ceil(kept / factor)), 1)
+    return schedule
+
+
+def search(df, prepare, build, space, target="price", mode="halving", workers=None, validation_fraction=0.2,
+           factor=3, min_rows=None, random_state=42, threads_per_worker=1, shared_dir=None, on_trial=None):
+    """
+    Evaluate the candidates of `space` (a sklearn ParameterGrid spec) with `build(params)` estimators
+    on the rows of df, prepared by `prepare` (see write_shared);
+    build must be picklable (a module-level function or functools.partial of one).
+    on_trial(result) is called in the parent process as each trial finishes (e.g. to log it).
+    Returns every trial result, round by round.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+    candidates = list(ParameterGrid(space))
+    tmp_dir = shared_dir or tempfile.mkdtemp(prefix="search-")
+    try:
+        n_train = write_shared(df, prepare, tmp_dir, target, validation_fraction, random_state)
+        n_val = len(np.load(os.path.join(tmp_dir, "y.npy"), mmap_mode="r")) - n_train
+        schedule = [(len(candidates), n_train)] if mode == "grid" else \
+            halving_schedule(len(candidates), n_train, factor, min_rows)
+        print(f"INFO: {mode} search over {len(candidates)} candidates, {n_train} train / "
+              f"{n_val} validation rows, rounds (candidates, rows): {schedule}")
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tmp_dir, n_train, build, threads_per_worker)) as pool:
+            for kept, rows in schedule:
+                candidates = candidates[:kept]
+                round_results = []
+                for result in pool.map(run_trial, candidates, [rows] * len(candidates)):
+                    round_results.append(result)
+                    if on_trial:
+                        on_trial(result)
+                results.extend(round_results)
+                round_results.sort(key=lambda r: r["val_r2"], reverse=True)
+                candidates = [r["params"] for r in round_results]
+        return results
+    finally:
+        if not shared_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def select_best(results, max_latency_ms=None, latency_key="predict_1_ms"):
+    """Best validation r2 among full-size trials, optionally only those within a latency budget."""
+    full_rows = max(r["n_rows"] for r in results)
+    eligible = [r for r in results if r["n_rows"] == full_rows
+                and (max_latency_ms is None or r[latency_key] <= max_latency_ms)]
+    if not eligible:
+        raise ValueError(f"No candidate predicts within {max_latency_ms} ms ({latency_key})")
+    return max(eligible, key=lambda r: r["val_r2"])
@@ -0,0 +1,182 @@
+# src/interaction_weights.py
+import numpy as np
+from scipy.sparse import csr_matrix
+
+WEIGHTINGS = ("count", "log_spend", "recency", "tfidf", "bm25")
+
+
+class RecencyClock:
+    """
+    Exponential recency decay, accumulated chunk by chunk.
+    Each booking contributes exp(-ln2 * age / half_life) where age is measured from the
+    latest booking seen. Rows are weighted relative to the first date seen while reading
+    and rescaled once the latest date is known.
+    """
+
+    def __init__(self, half_life_days=180.0):
+        self.rate = np.log(2.0) / float(half_life_days)
+        self.origin = None
+        self.latest = None
+
+    def weights(self, days):
+        """Unscaled weights for an array of dates (as days since epoch)."""
+        if len(days) == 0:
+            return np.zeros(0)
+        if self.origin is None:
+            self.origin = int(days.min())
+        self.latest = int(days.max()) if self.latest is None else max(self.latest, int(days.max()))
+        return np.exp(self.rate * (days - self.origin))
+
+    def scale(self):
+        if self.latest is None:
+            return 1.0
+        return float(np.exp(-self.rate * (self.latest - self.origin)))
+
+
+def item_idf(matrix, scheme="tfidf"):
+    """Per-item idf of the tfidf or bm25 scheme, from the user x item count matrix."""
+    matrix = csr_matrix(matrix)
+    n_users = matrix.shape[0]
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    if scheme == "bm25":
+        return np.log(n_users) - np.log1p(df)
+    return np.log(n_users / np.maximum(df, 1))
+
+
+def tfidf_weight(matrix):
+    """Down-weight popular items: count * log(n_users / n_users_with_item)."""
+    matrix = csr_matrix(matrix, dtype=np.float64, copy=True)
+    idf = item_idf(matrix, "tfidf")
+    matrix.data *= idf[matrix.indices]
+    return matrix
+
+
+def bm25_weight(matrix, k1=1.2, b=0.75):
+    """BM25 confidence: saturating counts, normalised by user activity, times item idf."""
+    matrix = csr_matrix(matrix, dtype=np.float64, copy=True)
+    idf = item_idf(matrix, "bm25")
+
+    row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+    length_norm = (1.0 - b) + b * row_sums / max(row_sums.mean(), 1e-12)
+    row_norm = np.repeat(length_norm, np.diff(matrix.indptr))
+    matrix.data = matrix.data * (k1 + 1.0) / (k1 * row_norm + matrix.data) * idf[matrix.indices]
+    return matrix
+
+
+def weight_interactions(rows, cols, aggregates, shape, scheme="count", recency_scale=1.0):
+    """
+    Sparse user x item matrix from aggregated (user, item) pairs.
+    `aggregates` holds per-pair arrays: "count" (bookings), "spend" (price/total),
+    "recency" (unscaled decay sums from RecencyClock) and optionally "undated" (bookings
+    without a date, weighted 1 like the latest booking). Duplicate pairs are summed first,
+    so schemes see totals per user and item.
+    - count: number of bookings (the original binary matrix with duplicates summed)
+    - log_spend: log1p of total spend
+    - recency: bookings decayed by age
+    - tfidf / bm25: counts reweighted by item popularity and user activity
+    """
+    if scheme not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting '{scheme}', expected one of {WEIGHTINGS}")
+
+    def summed(values):
+        m = csr_matrix((np.asarray(values, dtype=np.float64), (rows, cols)), shape=shape)
+        m.sum_duplicates()
+        return m
+
+    if scheme == "log_spend":
+        matrix = summed(aggregates["spend"])
+        matrix.data = np.log1p(np.maximum(matrix.data, 0.0))
+        return matrix
+    if scheme == "recency":
+        recency = np.asarray(aggregates["recency"]) * recency_scale
+        if "undated" in aggregates:
+            recency = recency + np.asarray(aggregates["undated"])
+        return summed(recency)
+
+    matrix = summed(aggregates["count"])
+    if scheme == "tfidf":
+        return tfidf_weight(matrix)
+    if scheme == "bm25":
+        return bm25_weight(matrix)
+    return matrix
+
+
+def interaction_totals(rows, cols, aggregates, shape, recency_scale=1.0):
+    """
+    Per (user, item) training totals, the inputs of FoldInWeighting.row: CSR (indptr, indices)
+    over the user x item matrix and an (nnz, 3) array of [bookings, spend, recency], with the
+    recency sums scaled and undated bookings counted as 1 (as in weight_interactions).
+    """
+    recency = np.asarray(aggregates["recency"], dtype=np.float64) * recency_scale
+    if "undated" in aggregates:
+        recency = recency + np.asarray(aggregates["undated"])
+    values = np.column_stack([aggregates["count"], aggregates["spend"], recency])
+    pairs, inverse = np.unique(np.asarray(rows, dtype=np.int64) * shape[1] + np.asarray(cols, dtype=np.int64),
+                               return_inverse=True)
+    totals = np.zeros((len(pairs), 3))
+    np.add.at(totals, inverse.ravel(), values)
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(pairs // shape[1], minlength=shape[0]))])
+    return indptr, (pairs % shape[1]).astype(np.int32), totals
+
+
+class FoldInWeighting:
+    """
+    A training run's weighting scheme, applied to interactions folded in after training
+    (fold_in.FoldInStore) so folded-in rows are on the scale of the trained matrix.
+    Rows are built from per-item booking counts, total spend and recency sums (decay()):
+    - recency: bookings decay by age relative to the latest booking at training time
+      (later bookings weigh 1, like the latest one did),
+    - tfidf / bm25: the training matrix's item idf; bm25 normalises by the user's folded-in
+      bookings relative to the mean bookings per user at training time.
+    """
+
+    def __init__(self, scheme="count", item_idf=None, half_life_days=180.0, latest_day=None,
+                 mean_row_count=1.0, k1=1.2, b=0.75):
+        if scheme not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting '{scheme}', expected one of {WEIGHTINGS}")
+        if scheme in ("tfidf", "bm25") and item_idf is None:
+            raise ValueError(f"The {scheme} weighting needs the item idf of the training matrix")
+        self.scheme = scheme
+        self.item_idf = None if item_idf is None else np.asarray(item_idf, dtype=np.float64)
+        self.half_life_days = float(half_life_days)
+        self.latest_day = latest_day
+        self.mean_row_count = float(mean_row_count)
+        self.k1 = float(k1)
+        self.b = float(b)
+
+    @classmethod
+    def fit(cls, scheme, counts=None, half_life_days=180.0, latest_day=None):
+        """From the training run: counts (user x item bookings) is only needed for tfidf / bm25."""
+        if scheme not in ("tfidf", "bm25"):
+            return cls(scheme, half_life_days=half_life_days, latest_day=latest_day)
+        row_counts = np.asarray(counts.sum(axis=1)).ravel()
+        return cls(scheme, item_idf(counts, scheme), half_life_days, latest_day,
+                   mean_row_count=max(float(row_counts.mean()), 1e-12))
+
+    def params(self):
+        """Everything but the scheme and the idf array, as JSON-friendly values."""
+        return {"half_life_days": self.half_life_days, "latest_day": self.latest_day,
+                "mean_row_count": self.mean_row_count, "k1": self.k1, "b": self.b}
+
+    @property
+    def needs_spend(self):
+        return self.scheme == "log_spend"
+
+    def decay(self, day=None):
+        """Recency weight of one booking on `day` (days since epoch); None counts as the latest day."""
+        if day is None or self.latest_day is None:
+            return 1.0
+        return float(np.exp(-np.log(2.0) / self.half_life_days * max(0, self.latest_day - day)))
+
+    def row(self, items, count, spend, recency):
+        """Weights of one user's folded-in row from per-item bookings, total spend and recency sums."""
+        if self.scheme == "log_spend":
+            return np.log1p(np.maximum(spend, 0.0))
+        if self.scheme == "recency":
+            return np.asarray(recency, dtype=np.float64)
+        if self.scheme == "tfidf":
+            return count * self.item_idf[items]
+        if self.scheme == "bm25":
+            length_norm = (1.0 - self.b) + self.b * count.sum() / self.mean_row_count
+            return count * (self.k1 + 1.0) / (self.k1 * length_norm + count) * self.item_idf[items]
+        return np.asarray(count, dtype=np.float64)
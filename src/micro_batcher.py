@@ -0,0 +1,194 @@
+# src/micro_batcher.py
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherUnavailable(RuntimeError):
+    """The batcher cannot take or answer a request in time (queue full or timeout)."""
+
+
+class MicroBatcher:
+    """
+    Merges feature frames submitted by concurrent requests into one predict call.
+    - A background thread waits for the first queued frame, then keeps collecting
+      until `max_batch_size` rows are queued or `max_wait_ms` has passed.
+    - The merged frame is predicted once and the results are fanned back out
+      to each caller's Future.
+    - If the merged call fails, each frame is retried on its own so one bad
+      request does not fail the others.
+    - Each frame is queued with the model it should run on; frames queued
+      against different models (e.g. across a hot reload) are never merged.
+    - Any other error in the worker loop fails the affected Futures instead of
+      the thread, and callers that time out have their frame dropped from the queue.
+    The worker thread is started lazily (and restarted after a fork or if it
+    died), so it is safe to create the batcher before a pre-forking server spawns workers.
+    """
+
+    def __init__(self, max_batch_size=64, max_wait_ms=2.0, max_queue=10000):
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait_ms = float(max_wait_ms)
+        self.max_queue = int(max_queue)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._worker = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {
+            "requests": 0,
+            "rows": 0,
+            "batches": 0,
+            "max_batch_rows": 0,
+            "fallbacks": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "wait_ms_total": 0.0,
+            "predict_ms_total": 0.0,
+        }
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._reset_stats()
+            self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._worker.start()
+            self._pid = os.getpid()
+
+    def submit(self, model, X):
+        """Queue a feature frame for `model`; returns a Future resolving to its predictions."""
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put_nowait((model, X, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise BatcherUnavailable("Prediction queue is full, try again later")
+        return future
+
+    def predict(self, model, X, timeout=None):
+        """Predictions for X; raises BatcherUnavailable if none arrive within `timeout` seconds."""
+        future = self.submit(model, X)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()  # the worker skips the frame if it has not picked it up yet
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise BatcherUnavailable(f"No prediction within {timeout}s, the prediction queue is stalled")
+
+    def _collect(self, items):
+        """Block for the first item, then gather more (into `items`) until the batch is full or the window closes."""
+        items.append(self._queue.get())
+        rows = len(items[0][1])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            rows += len(item[1])
+        return rows
+
+    def _predict_group(self, model, group):
+        """Predict all frames queued for one model with a single call."""
+        frames = [X for _, X, _, _ in group]
+        try:
+            merged = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            preds = np.asarray(model.predict(merged))
+            if len(preds) != sum(len(X) for X in frames):
+                raise ValueError(f"model returned {len(preds)} predictions for {sum(len(X) for X in frames)} rows")
+        except Exception as e:
+            logger.warning("Micro-batch of %d requests failed (%s); predicting them one by one", len(group), e)
+            for _, X, future, _ in group:
+                try:
+                    future.set_result(np.asarray(model.predict(X)))
+                except Exception as item_error:
+                    future.set_exception(item_error)
+            return True
+        offset = 0
+        for _, X, future, _ in group:
+            future.set_result(preds[offset:offset + len(X)])
+            offset += len(X)
+        return False
+
+    def _run(self):
+        while True:
+            items = []
+            try:
+                self._batch(items)
+            except Exception as e:
+                # Never let one batch kill the only worker thread: fail its callers instead
+                logger.exception("Micro-batch worker error: %s", e)
+                with self._lock:
+                    self._stats["errors"] += 1
+                for _, _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _batch(self, items):
+        """Collect one batch into `items`, predict it and resolve its Futures."""
+        rows = self._collect(items)
+        started = time.perf_counter()
+        # Drop frames whose caller gave up (cancelled); the rest can no longer be cancelled
+        items[:] = [item for item in items if item[2].set_running_or_notify_cancel()]
+        groups = {}
+        for item in items:
+            groups.setdefault(id(item[0]), []).append(item)
+        fallback = False
+        for group in groups.values():
+            fallback |= self._predict_group(group[0][0], group)
+
+        finished = time.perf_counter()
+        with self._lock:
+            stats = self._stats
+            stats["requests"] += len(items)
+            stats["rows"] += rows
+            stats["batches"] += 1
+            stats["max_batch_rows"] = max(stats["max_batch_rows"], rows)
+            stats["fallbacks"] += int(fallback)
+            stats["wait_ms_total"] += sum(started - queued for _, _, _, queued in items) * 1000.0
+            stats["predict_ms_total"] += (finished - started) * 1000.0
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        requests = stats["requests"] or 1
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue": self.max_queue,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": stats["requests"],
+            "rows": stats["rows"],
+            "batches": stats["batches"],
+            "max_batch_rows": stats["max_batch_rows"],
+            "avg_batch_rows": round(stats["rows"] / batches, 2),
+            "avg_queue_wait_ms": round(stats["wait_ms_total"] / requests, 3),
+            "avg_predict_ms": round(stats["predict_ms_total"] / batches, 3),
+            "fallbacks": stats["fallbacks"],
+            "rejected": stats["rejected"],
+            "timeouts": stats["timeouts"],
+            "errors": stats["errors"],
+        }
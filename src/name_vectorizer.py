@@ -1,13 +1,46 @@
 import numpy as np
 import string
 
+NAME_MODES = ("chars", "ngrams")
+
+# Below this many names the per-name loop beats the NumPy setup cost (see bench_name_vectorizer.py)
+SMALL_BATCH = 8
+
+# Knuth's multiplicative hash constant, for bucketing packed n-gram bytes
+_HASH_MULTIPLIER = np.uint64(2654435761)
+
+
 class NameVectorizer:
-    def __init__(self):
+    """
+    Names -> fixed-length feature vectors.
+    - chars: counts of a-z in the lowercased name (26 float64 columns, the original features),
+    - ngrams: counts of hashed character n-grams (default bigrams + trigrams, over the UTF-8 bytes)
+      of the lowercased name padded with a space on each side, in n_features float32 columns.
+    transform_batch encodes the whole batch as one byte array and counts with np.bincount (chars)
+    or np.add.at into the float32 output (ngrams).
+    """
+    # Class-level defaults keep vectorizers pickled before these options existed loadable
+    mode = "chars"
+    ngram_range = (2, 3)
+    n_features = 1024
+
+    def __init__(self, mode="chars", ngram_range=(2, 3), n_features=1024):
+        if mode not in NAME_MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {NAME_MODES}")
         self.alphabet = string.ascii_lowercase
         self.char_index = {c: i for i, c in enumerate(self.alphabet)}
+        self.mode = mode
+        self.ngram_range = tuple(ngram_range)
+        self.n_features = int(n_features)
+
+    @property
+    def dim(self):
+        return len(self.alphabet) if self.mode == "chars" else self.n_features
 
     def transform_name(self, name):
         """Convert a name into a fixed-length vector based on character frequencies."""
+        if self.mode != "chars":
+            return self.transform_batch([name])[0]
         name = name.lower()
         vec = np.zeros(len(self.alphabet))
 
@@ -17,5 +50,52 @@ class NameVectorizer:
 
         return vec
 
+    def _encode(self, names, pad=""):
+        """
+        (bytes of the lowercased, \\0-separated names, row of every byte); separators get row -1.
+        NUL characters inside names are dropped, like transform_name ignores every non a-z character.
+        """
+        names = [f"{pad}{n}{pad}" for n in names] if pad else list(names)
+        # str.lower works per character, so lowering the joined string equals lowering each name;
+        # non-ASCII characters encode to bytes >= 128 and never count as a-z
+        joined = "\0".join(names).lower()
+        if joined.count("\0") != len(names) - 1:
+            joined = "\0".join(name.replace("\0", "") for name in names).lower()
+        data = np.frombuffer(joined.encode("utf-8"), dtype=np.uint8)
+        is_sep = data == 0
+        rows = np.cumsum(is_sep)
+        rows[is_sep] = -1
+        return data, rows
+
     def transform_batch(self, names):
-        return np.array([self.transform_name(n) for n in names])
+        n = len(names)
+        if n == 0:
+            return np.zeros((0, self.dim), dtype=np.float64 if self.mode == "chars" else np.float32)
+
+        if self.mode == "chars":
+            if n < SMALL_BATCH:
+                return np.array([self.transform_name(name) for name in names])
+            data, rows = self._encode(names)
+            letters = (data >= ord("a")) & (data <= ord("z"))
+            index = rows[letters] * 26 + (data[letters] - ord("a"))
+            return np.bincount(index, minlength=n * 26).reshape(n, 26).astype(np.float64)
+
+        data, rows = self._encode(names, pad=" ")
+        buckets = []
+        for size in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            if len(data) < size:
+                continue
+            starts = np.arange(len(data) - size + 1)
+            # An n-gram is valid if it starts and ends in the same name (no separator inside)
+            valid = (rows[starts] >= 0) & (rows[starts] == rows[starts + size - 1])
+            starts = starts[valid]
+            key = np.full(len(starts), size, dtype=np.uint64)  # the size salts the hash
+            for offset in range(size):
+                key = (key << np.uint64(8)) | data[starts + offset].astype(np.uint64)
+            bucket = (key * _HASH_MULTIPLIER >> np.uint64(16)) % np.uint64(self.n_features)
+            buckets.append(rows[starts] * self.n_features + bucket.astype(np.int64))
+        out = np.zeros((n, self.n_features), dtype=np.float32)
+        for index in buckets:
+            # Accumulate straight into the float32 output (no n x n_features int64 temporary)
+            np.add.at(out.reshape(-1), index, 1.0)
+        return out
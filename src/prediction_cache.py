@@ -0,0 +1,138 @@
+# src/prediction_cache.py
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class InMemoryBackend:
+    """
+    Process-local LRU store with a per-entry TTL.
+    Also serves as the stand-in for a shared backend in tests.
+    """
+
+    def __init__(self, max_size=10000, ttl=300.0):
+        self.max_size = int(max_size)
+        self.ttl = float(ttl)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    values.append(None)
+                elif entry[1] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    values.append(None)
+                else:
+                    self._data.move_to_end(key)
+                    values.append(entry[0])
+        return values
+
+    def set_many(self, items):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._data[key] = (value, expires)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"backend": "memory", "size": len(self._data), "max_size": self.max_size, "ttl": self.ttl,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+
+class RedisBackend:
+    """
+    Shared store so all workers/pods reuse each other's predictions (requires `redis`).
+    Size is bounded by Redis' own maxmemory policy; entries expire after `ttl`.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", ttl=300.0, prefix="voyage:pred:"):
+        import redis  # optional dependency
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = float(ttl)
+        self.prefix = prefix
+
+    def get_many(self, keys):
+        raw = self.client.mget([self.prefix + k for k in keys])
+        return [None if v is None else float(v) for v in raw]
+
+    def set_many(self, items):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items:
+            pipe.set(self.prefix + key, repr(float(value)), px=int(self.ttl * 1000))
+        pipe.execute()
+
+    def clear(self):
+        # Keys are namespaced by model tag, so old entries are never read again and expire after ttl.
+        # Deleting them here would wipe entries other workers/pods are still serving, once per worker.
+        pass
+
+    def stats(self):
+        return {"backend": "redis", "ttl": self.ttl}
+
+
+class PredictionCache:
+    """
+    Caches predictions keyed on a canonical hash of the assembled feature row
+    (after date splitting and column ordering), namespaced by model version.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def row_keys(X, namespace=""):
+        """One stable key per row of the feature frame X."""
+        keys = []
+        for row in X.itertuples(index=False, name=None):
+            canonical = json.dumps(row, separators=(",", ":"), default=str)
+            digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+            keys.append(f"{namespace}:{digest}")
+        return keys
+
+    def get_many(self, keys):
+        values = self.backend.get_many(keys)
+        hits = sum(v is not None for v in values)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(values) - hits
+        return values
+
+    def set_many(self, keys, values):
+        self.backend.set_many(zip(keys, (float(v) for v in values)))
+
+    def invalidate(self):
+        self.backend.clear()
+
+    def count_error(self):
+        """Record a backend call that failed (the caller carried on uncached)."""
+        with self._lock:
+            self.errors += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        stats = {"hits": self.hits, "misses": self.misses, "errors": self.errors,
+                 "hit_rate": round(self.hits / total, 4) if total else None}
+        stats.update(self.backend.stats())
+        return stats
@@ -1,5 +1,15 @@
 # src/preprocess.py
+import os
+import json
+import argparse
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+from schema import read_table
+
+NUMERIC_COLS = ("price", "distance", "time", "total")
 
 def prepare_dataset(users_path, flights_path, hotels_path=None):
     """
@@ -7,14 +17,14 @@ def prepare_dataset(users_path, flights_path, hotels_path=None):
     Keeps logging prints so you know what's happening.
     """
     print(f"[INFO] Loading users from {users_path}")
-    users = pd.read_csv(users_path)
+    users = read_table("users", users_path)
     print(f"[INFO] Loading flights from {flights_path}")
-    flights = pd.read_csv(flights_path)
+    flights = read_table("flights", flights_path)
 
     hotels = None
     if hotels_path:
         print(f"[INFO] Loading hotels from {hotels_path}")
-        hotels = pd.read_csv(hotels_path)
+        hotels = read_table("hotels", hotels_path)
 
     # merge flights + users
     print("[INFO] Merging flights + users")
@@ -25,18 +35,139 @@ def prepare_dataset(users_path, flights_path, hotels_path=None):
         print("[INFO] Merging hotels")
         df = df.merge(hotels, on=["travelCode", "userCode"], how="left", suffixes=("", "_hotel"))
 
-    # try to coerce common numeric columns (safe)
-    for col in ("price", "distance", "time", "total"):
+    df = coerce_types(df)
+    print(f"[INFO] Merged dataframe shape: {df.shape}")
+    return df
+
+def coerce_types(df):
+    """Coerce common numeric columns and parse date columns in place (non-fatal)."""
+    for col in NUMERIC_COLS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    # attempt to parse date columns (non-fatal)
     for col in list(df.columns):
         if "date" in col.lower():
             try:
                 df[col] = pd.to_datetime(df[col], errors="coerce")
             except Exception:
                 pass
-
-    print(f"[INFO] Merged dataframe shape: {df.shape}")
     return df
+
+# --------------------------------------------------------
+# Streaming mode: flights in chunks -> column store on disk
+# --------------------------------------------------------
+
+def lookup(table, keys, suffix, taken):
+    """
+    Rows of `table` (indexed by its join key) aligned to `keys`, like a left merge:
+    missing keys give NaN, and columns clashing with `taken` get `suffix`.
+    """
+    rows = table.reindex(keys)
+    rows.index = range(len(rows))
+    return rows.rename(columns={c: c + suffix for c in rows.columns if c in taken})
+
+def write_column_part(out_dir, col, part, values):
+    """Strings/categoricals are stored as int32 codes + categories, everything else as a plain .npy array."""
+    col_dir = os.path.join(out_dir, col)
+    os.makedirs(col_dir, exist_ok=True)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        kind, codes, categories = "category", values.cat.codes.to_numpy(), values.cat.categories
+    elif values.dtype == object:
+        kind, (codes, categories) = "string", pd.factorize(values)
+    else:
+        np.save(os.path.join(col_dir, f"part-{part:05d}.npy"), values.to_numpy())
+        return "value"
+    np.save(os.path.join(col_dir, f"part-{part:05d}.npy"), codes.astype(np.int32))
+    np.save(os.path.join(col_dir, f"part-{part:05d}.categories.npy"), np.asarray(categories, dtype=str))
+    return kind
+
+def prepare_dataset_streaming(users_path, flights_path, hotels_path=None, out_dir="data/prepared",
+                              chunksize=200_000):
+    """
+    Same rows and columns as prepare_dataset, without holding the merged frame in memory.
+    - users and hotels are loaded once and indexed by their join keys,
+    - flights are read chunk by chunk, joined by index lookup and type-coerced per chunk,
+    - every chunk is written as one part per column under out_dir (see load_prepared).
+    Hotel keys (travelCode, userCode) are expected to be unique, as in the source data.
+    """
+    print(f"[INFO] Loading users from {users_path}")
+    users = read_table("users", users_path)
+    users_by_code = users.set_index("code", drop=False)
+
+    hotels_by_trip = None
+    if hotels_path:
+        print(f"[INFO] Loading hotels from {hotels_path}")
+        hotels = read_table("hotels", hotels_path)
+        hotels_by_trip = hotels.set_index(["travelCode", "userCode"])
+        if not hotels_by_trip.index.is_unique:
+            raise ValueError("hotels has duplicate (travelCode, userCode) keys; use prepare_dataset instead")
+
+    os.makedirs(out_dir, exist_ok=True)
+    kinds, n_rows, part = {}, 0, 0
+    print(f"[INFO] Streaming flights from {flights_path} in chunks of {chunksize}")
+    for flights in read_table("flights", flights_path, chunksize=chunksize):
+        flights = flights.reset_index(drop=True)
+        parts = [flights, lookup(users_by_code, flights["userCode"], "_user", flights.columns)]
+        if hotels_by_trip is not None:
+            keys = pd.MultiIndex.from_arrays([flights["travelCode"], flights["userCode"]])
+            taken = set(parts[0].columns) | set(parts[1].columns)
+            parts.append(lookup(hotels_by_trip, keys, "_hotel", taken))
+        chunk = coerce_types(pd.concat(parts, axis=1))
+
+        for col in chunk.columns:
+            kinds[col] = write_column_part(out_dir, col, part, chunk[col])
+        n_rows += len(chunk)
+        part += 1
+
+    write_meta(out_dir, kinds, part, n_rows)
+    print(f"[INFO] Wrote {n_rows} rows x {len(kinds)} columns in {part} parts to {out_dir}")
+    return out_dir
+
+def write_meta(out_dir, kinds, n_parts, n_rows):
+    with open(os.path.join(out_dir, "_meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"columns": list(kinds), "kinds": kinds, "n_parts": n_parts, "n_rows": n_rows}, f, indent=2)
+
+def save_prepared(df, out_dir):
+    """Write an in-memory frame as a single-part column store readable by load_prepared."""
+    os.makedirs(out_dir, exist_ok=True)
+    kinds = {col: write_column_part(out_dir, col, 0, df[col]) for col in df.columns}
+    write_meta(out_dir, kinds, 1, len(df))
+    return out_dir
+
+def read_meta(out_dir):
+    with open(os.path.join(out_dir, "_meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def load_prepared(out_dir, columns=None, parts=None):
+    """
+    Read a column store written by prepare_dataset_streaming, only for `columns` (default: all)
+    and only the given part numbers (default: all, in order).
+    Parts are concatenated with normal dtype promotion; categoricals and strings come back as written.
+    """
+    meta = read_meta(out_dir)
+    columns = meta["columns"] if columns is None else [c for c in meta["columns"] if c in set(columns)]
+    part_ids = range(meta["n_parts"]) if parts is None else parts
+
+    data = {}
+    for col in columns:
+        col_dir = os.path.join(out_dir, col)
+        paths = [os.path.join(col_dir, f"part-{i:05d}.npy") for i in part_ids]
+        if meta["kinds"][col] in ("category", "string"):
+            parts = [pd.Categorical.from_codes(np.load(p), np.load(p.replace(".npy", ".categories.npy")))
+                     for p in paths]
+            values = union_categoricals(parts, ignore_order=True)
+            data[col] = values if meta["kinds"][col] == "category" else np.asarray(values).astype(object)
+        else:
+            data[col] = np.concatenate([np.load(p) for p in paths])
+    return pd.DataFrame(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge users/flights/hotels into a column store")
+    parser.add_argument("--users", default="data/users.csv")
+    parser.add_argument("--flights", default="data/flights.csv")
+    parser.add_argument("--hotels", default="data/hotels.csv")
+    parser.add_argument("--out", default="data/prepared")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    args = parser.parse_args()
+    prepare_dataset_streaming(args.users, args.flights, args.hotels or None, args.out, args.chunksize)
@@ -0,0 +1,166 @@
+# src/preprocess_cache.py
+"""
+Content-addressed cache for the training inputs of the price model.
+
+Two levels, so runs that only change prepare_X_y parameters still reuse the merge:
+    <cache>/frames/<frame_key>/        merged frame as a column store (preprocess.load_prepared)
+                                       frame_key = hash(input file contents + loader options)
+    <cache>/features/<features_key>/   y.npy, the transformed matrix Xt (.npy, memory-mapped on load),
+                                       the fitted preprocessor and the num/cat column lists
+                                       features_key = hash(frame_key + prepare_X_y parameters)
+
+Entries are written to a temporary directory and renamed into place, so concurrent
+runs never see a half-written entry.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+from features import prepare_X_y
+from preprocess import load_prepared, save_prepared
+
+CACHE_DIR = os.getenv("PREPROCESS_CACHE_DIR", "cache/preprocess")
+# Bump when prepare_dataset / prepare_X_y change behaviour, to invalidate old entries
+CACHE_VERSION = 1
+
+
+def hash_inputs(paths, extra=None):
+    """Hash of the contents of files (or every file under directories) plus JSON-able options."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"v{CACHE_VERSION}".encode())
+    for path in paths:
+        if path is None:
+            digest.update(b"\0none")
+            continue
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for name in files:
+            digest.update(os.path.relpath(name, path if os.path.isdir(path) else os.path.dirname(path)).encode())
+            with open(name, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    digest.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def save_matrix(out_dir, matrix):
+    """Dense -> Xt.npy; sparse CSR -> its data/indices/indptr arrays, each a plain .npy."""
+    if sparse.issparse(matrix):
+        matrix = sparse.csr_matrix(matrix)
+        for name in ("data", "indices", "indptr"):
+            np.save(os.path.join(out_dir, f"Xt.{name}.npy"), getattr(matrix, name))
+        with open(os.path.join(out_dir, "Xt.shape.json"), "w", encoding="utf-8") as f:
+            json.dump(list(matrix.shape), f)
+    else:
+        np.save(os.path.join(out_dir, "Xt.npy"), np.asarray(matrix))
+
+
+def load_matrix(out_dir, mmap_mode="r"):
+    if os.path.exists(os.path.join(out_dir, "Xt.npy")):
+        return np.load(os.path.join(out_dir, "Xt.npy"), mmap_mode=mmap_mode)
+    with open(os.path.join(out_dir, "Xt.shape.json"), encoding="utf-8") as f:
+        shape = tuple(json.load(f))
+    data, indices, indptr = (np.load(os.path.join(out_dir, f"Xt.{name}.npy"), mmap_mode=mmap_mode)
+                             for name in ("data", "indices", "indptr"))
+    return sparse.csr_matrix((data, indices, indptr), shape=shape)
+
+
+class PreprocessCache:
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def _path(self, kind, key):
+        return os.path.join(self.root, kind, key)
+
+    def _publish(self, kind, key, write):
+        """Run write(tmp_dir), then move tmp_dir into place (first writer wins)."""
+        os.makedirs(os.path.join(self.root, kind), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=os.path.join(self.root, kind))
+        try:
+            write(tmp_dir)
+            os.replace(tmp_dir, self._path(kind, key))
+        except OSError:
+            if not os.path.isdir(self._path(kind, key)):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def frame(self, key, load_frame):
+        """(merged frame, hit): read from the cache, or built with load_frame() and stored."""
+        path = self._path("frames", key)
+        if os.path.isdir(path):
+            return load_prepared(path), True
+        df = load_frame()
+        self._publish("frames", key, lambda tmp: save_prepared(df, tmp))
+        return df, False
+
+    def features(self, key, build):
+        """(features dict, hit): Xt is memory-mapped when read from the cache."""
+        path = self._path("features", key)
+        if os.path.isdir(path):
+            with open(os.path.join(path, "columns.json"), encoding="utf-8") as f:
+                columns = json.load(f)
+            return {
+                "y": np.load(os.path.join(path, "y.npy"), mmap_mode="r"),
+                "Xt": load_matrix(path),
+                "preprocessor": joblib.load(os.path.join(path, "preprocessor.joblib")),
+                **columns,
+            }, True
+
+        features = build()
+
+        def write(tmp):
+            np.save(os.path.join(tmp, "y.npy"), np.asarray(features["y"]))
+            save_matrix(tmp, features["Xt"])
+            joblib.dump(features["preprocessor"], os.path.join(tmp, "preprocessor.joblib"))
+            with open(os.path.join(tmp, "columns.json"), "w", encoding="utf-8") as f:
+                json.dump({"num_cols": features["num_cols"], "cat_cols": features["cat_cols"]}, f, indent=2)
+
+        self._publish("features", key, write)
+        return features, False
+
+
+def prepare_features(inputs, load_frame, target="price", top_k=50, encoding="onehot", extra=None,
+                     cache_dir=CACHE_DIR):
+    """
+    Fitted preprocessor + transformed training matrix for the given input files.
+    - inputs: CSV paths or a column-store directory, hashed by content,
+    - load_frame: builds the merged frame on a cache miss,
+    - encoding: categorical encoding, see features.ENCODINGS (sparse Xt is cached as CSR arrays),
+    - extra: other options that change the merged frame (e.g. the selected columns).
+    With cache_dir=None nothing is read or written.
+    Returns a dict with y, Xt, preprocessor, num_cols, cat_cols and the cache keys/hits.
+    """
+    def build(df):
+        X, y, preprocessor, num_cols, cat_cols = prepare_X_y(df, target=target, top_k=top_k, encoding=encoding)
+        Xt = preprocessor.fit_transform(X, y)
+        return {"y": y.to_numpy(), "Xt": Xt, "preprocessor": preprocessor,
+                "num_cols": num_cols, "cat_cols": cat_cols}
+
+    if not cache_dir:
+        features = build(load_frame())
+        features.update(frame_key=None, features_key=None, frame_hit=False, features_hit=False)
+        return features
+
+    cache = PreprocessCache(cache_dir)
+    frame_key = hash_inputs(inputs, extra)
+    features_key = hash_inputs([], {"frame": frame_key, "target": target, "top_k": top_k, "encoding": encoding})
+    frame_hit = None  # the merged frame is only needed on a features miss
+
+    def build_from_frame():
+        nonlocal frame_hit
+        df, frame_hit = cache.frame(frame_key, load_frame)
+        return build(df)
+
+    features, features_hit = cache.features(features_key, build_from_frame)
+    features.update(frame_key=frame_key, features_key=features_key,
+                    frame_hit=frame_hit, features_hit=features_hit)
+    return features
@@ -1,58 +1,400 @@
 # src/recommender_api.py
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional
+import os
+import json
+import time
+import threading
 import numpy as np
-import pickle
-from scipy.sparse import load_npz
+from ann_index import IVFIndex
+from fold_in import FoldInStore
+from interaction_weights import FoldInWeighting
 
-app = FastAPI()
+MODELS_DIR = os.getenv("RECOMMENDER_MODELS_DIR", "models")
+# 1 = accept liveness probes immediately and load artifacts in a background thread
+BACKGROUND_LOAD = os.getenv("RECOMMENDER_BACKGROUND_LOAD", "0").lower() in ("1", "true", "yes")
+ITEM_TYPES = ("flight", "hotel")
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_MIN_ITEMS = int(os.getenv("ANN_MIN_ITEMS", "10000"))
+# Interactions received since training; "" keeps fold-ins in memory only
+FOLDIN_LOG = os.getenv("FOLDIN_LOG", os.path.join(MODELS_DIR, "foldin_events.ndjson"))
+FOLDIN_MAX_UNKNOWN_ITEM_RATE = float(os.getenv("FOLDIN_MAX_UNKNOWN_ITEM_RATE", "0.05"))
+FOLDIN_MAX_RESIDUAL = float(os.getenv("FOLDIN_MAX_RESIDUAL", "0.5"))
+FOLDIN_MAX_FOLDED_FRACTION = float(os.getenv("FOLDIN_MAX_FOLDED_FRACTION", "0.1"))
 
-print("Loading recommender model...")
 
-with open("models/recommender_svd.pkl", "rb") as f:
-    svd = pickle.load(f)
+class RecommenderArtifacts:
+    """
+    Everything the API serves from, loaded from the models directory:
+    user/item factors, sorted user ids, item names, per-type partitions and optional IVF indexes,
+    plus the fold-in overlay for users whose interactions arrived after training.
+    """
 
-with open("models/user_to_idx.pkl", "rb") as f:
-    user_to_idx = pickle.load(f)
+    def __init__(self, user_embeddings, item_embeddings, user_ids, item_list):
+        self.user_embeddings = user_embeddings
+        self.item_embeddings = item_embeddings
+        self.user_ids = user_ids
+        self.item_list = item_list
+        self.partition_items = {}
+        self.partition_factors = {}
+        self.item_index = {}
+        self.fold_in = None
+        self.training_run = {}
+        self.interaction_totals = None  # (indptr, item indices, [bookings, spend, recency] rows) per trained user
+        self.timings = {}
 
-with open("models/item_list.pkl", "rb") as f:
-    item_list = pickle.load(f)
+    @classmethod
+    def load(cls, models_dir=MODELS_DIR):
+        """Load all artifacts, recording (and printing) how long each stage takes."""
+        timings = {}
 
-with open("models/interactions.npz", "rb") as f:
-    interaction_matrix = load_npz(f)
+        def path(name):
+            return os.path.join(models_dir, name)
 
-# Precompute embeddings
-user_embeddings = svd.transform(interaction_matrix)
-item_embeddings = svd.components_.T
+        def stage(name, start):
+            timings[name] = round((time.perf_counter() - start) * 1000.0, 2)
+            print(f"[startup] {name}: {timings[name]} ms")
 
-print("Model loaded successfully!")
+        if os.path.exists(path("user_factors.npy")):
+            # Pickle-free artifacts, memory-mapped: workers share the pages through the OS cache
+            # and startup does not depend on the number of users
+            start = time.perf_counter()
+            artifacts = cls(
+                user_embeddings=np.load(path("user_factors.npy"), mmap_mode="r"),
+                item_embeddings=np.load(path("item_factors.npy"), mmap_mode="r"),
+                user_ids=np.load(path("user_ids.npy"), mmap_mode="r"),
+                item_list=np.load(path("item_names.npy"), mmap_mode="r"),
+            )
+            stage("mmap_open", start)
+        else:
+            # Legacy pickles: recompute the user factors from the interaction matrix
+            import pickle
+            from scipy.sparse import load_npz
 
-@app.get("/recommend")
-def recommend(user_id: int, top_k: int = 5):
-    if user_id not in user_to_idx:
-        return {"flight_recommendations": [], "hotel_recommendations": []}
+            start = time.perf_counter()
+            with open(path("recommender_svd.pkl"), "rb") as f:
+                svd = pickle.load(f)
+            with open(path("user_to_idx.pkl"), "rb") as f:
+                user_to_idx = pickle.load(f)
+            with open(path("item_list.pkl"), "rb") as f:
+                item_list = pickle.load(f)
+            stage("unpickle", start)
+
+            start = time.perf_counter()
+            with open(path("interactions.npz"), "rb") as f:
+                interaction_matrix = load_npz(f)
+            stage("npz_read", start)
+
+            start = time.perf_counter()
+            user_ids = np.array(sorted(user_to_idx), dtype=np.int64)
+            user_embeddings = svd.transform(interaction_matrix)[[user_to_idx[u] for u in user_ids]]
+            stage("transform", start)
+            artifacts = cls(user_embeddings, svd.components_.T, user_ids, item_list)
+
+        # Per-type partitions: item indices + item-factor matrices (written by train_recommender.py)
+        start = time.perf_counter()
+        for item_type in ITEM_TYPES:
+            idx_path = path(f"{item_type}_item_idx.npy")
+            if os.path.exists(idx_path):
+                artifacts.partition_items[item_type] = np.load(idx_path, mmap_mode="r")
+            else:
+                # Older artifacts: derive the partition from the item strings once at startup
+                is_flight = np.array(["→" in item for item in artifacts.item_list], dtype=bool)
+                artifacts.partition_items[item_type] = np.flatnonzero(is_flight if item_type == "flight" else ~is_flight)
+            factors_path = path(f"{item_type}_item_factors.npy")
+            if os.path.exists(factors_path):
+                artifacts.partition_factors[item_type] = np.load(factors_path, mmap_mode="r")
+            else:
+                artifacts.partition_factors[item_type] = np.ascontiguousarray(
+                    artifacts.item_embeddings[artifacts.partition_items[item_type]]
+                )
+        stage("partitions", start)
+
+        # Optional ANN index per partition; small partitions are faster with the exact path
+        start = time.perf_counter()
+        for item_type in ITEM_TYPES:
+            index_path = path(f"{item_type}_item_ivf.npz")
+            if os.path.exists(index_path) and len(artifacts.partition_items[item_type]) >= ANN_MIN_ITEMS:
+                artifacts.item_index[item_type] = IVFIndex.load(index_path)
+                print(f"Loaded {item_type} IVF index with {artifacts.item_index[item_type].n_lists} lists")
+        stage("ann_index", start)
+
+        # Replay interactions received since training onto the (read-only) trained factors;
+        # only events tagged with this training run's id, earlier ones are part of the training data
+        start = time.perf_counter()
+        if os.path.exists(path("training_run.json")):
+            with open(path("training_run.json"), encoding="utf-8") as f:
+                artifacts.training_run = json.load(f)
+        # Folded-in rows are weighted with the training run's scheme (plain counts for older artifacts)
+        run = artifacts.training_run
+        weighting = FoldInWeighting(
+            run.get("weighting", "count"),
+            item_idf=np.load(path("item_idf.npy")) if os.path.exists(path("item_idf.npy")) else None,
+            **run.get("weighting_params", {}),
+        )
+        if os.path.exists(path("interaction_totals.npz")):
+            with np.load(path("interaction_totals.npz")) as data:
+                artifacts.interaction_totals = (data["indptr"], data["indices"], data["totals"])
+        projection_path = path("item_projection.npy")
+        artifacts.fold_in = FoldInStore(
+            artifacts.item_embeddings, artifacts.item_list, artifacts.trained_vector,
+            log_path=FOLDIN_LOG or None,
+            projection=np.load(projection_path) if os.path.exists(projection_path) else None,
+            run_id=run.get("run_id"),
+            weighting=weighting,
+            base_totals=artifacts.trained_totals if artifacts.interaction_totals is not None else None,
+            max_unknown_item_rate=FOLDIN_MAX_UNKNOWN_ITEM_RATE,
+            max_residual=FOLDIN_MAX_RESIDUAL,
+            max_folded_fraction=FOLDIN_MAX_FOLDED_FRACTION,
+            n_base_users=len(artifacts.user_ids),
+        )
+        stage("fold_in_replay", start)
+
+        artifacts.timings = timings
+        return artifacts
+
+    def lookup_users(self, ids):
+        """Row in user_embeddings for each user id (sorted-id binary search), -1 if unknown."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.user_ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.user_ids, ids), len(self.user_ids) - 1)
+        return np.where(self.user_ids[pos] == ids, pos, -1)
+
+    def trained_vector(self, user_id):
+        """Embedding from the last training run, None for users trained without."""
+        u_idx = self.lookup_users([user_id])[0]
+        return None if u_idx < 0 else np.asarray(self.user_embeddings[u_idx])
+
+    def trained_totals(self, user_id):
+        """(item indices, [bookings, spend, recency] rows) the user was trained on, None for users trained without."""
+        u_idx = self.lookup_users([user_id])[0]
+        if u_idx < 0:
+            return None
+        indptr, indices, totals = self.interaction_totals
+        return indices[indptr[u_idx]:indptr[u_idx + 1]], totals[indptr[u_idx]:indptr[u_idx + 1]]
+
+    def user_vectors(self, ids):
+        """(positions in `ids` of known users, their embeddings): fold-in overlay first, then trained factors."""
+        u_idx = self.lookup_users(ids)
+        positions, vectors = [], []
+        for pos, (user_id, i) in enumerate(zip(ids, u_idx)):
+            vector = self.fold_in.vector(int(user_id)) if self.fold_in is not None else None
+            if vector is None and i >= 0:
+                vector = self.user_embeddings[i]
+            if vector is not None:
+                positions.append(pos)
+                vectors.append(vector)
+        return positions, np.array(vectors).reshape(len(vectors), self.item_embeddings.shape[1])
+
+
+# --------------------------------------------------------
+# Lifecycle: liveness (/health) is up as soon as the process serves HTTP,
+# readiness (/ready) only once the artifacts are loaded
+# --------------------------------------------------------
+
+artifacts = None
+load_error = None
+_process_start = time.perf_counter()
+_load_lock = threading.Lock()
+
+def load_artifacts():
+    """Load the artifacts once (thread-safe) and publish them to the endpoints."""
+    global artifacts, load_error
+    with _load_lock:
+        if artifacts is not None:
+            return artifacts
+        print("Loading recommender model...")
+        start = time.perf_counter()
+        try:
+            loaded = RecommenderArtifacts.load(MODELS_DIR)
+        except Exception as e:
+            load_error = e
+            print(f"Failed to load recommender model: {e}")
+            raise
+        loaded.timings["total"] = round((time.perf_counter() - start) * 1000.0, 2)
+        artifacts = loaded
+        load_error = None
+        print(f"Model loaded successfully! ({loaded.timings['total']} ms)")
+        return artifacts
+
+def _load_in_background():
+    try:
+        load_artifacts()
+    except Exception:
+        pass  # reported through /ready
 
-    u_idx = user_to_idx[user_id]
+@asynccontextmanager
+async def lifespan(app):
+    if BACKGROUND_LOAD:
+        threading.Thread(target=_load_in_background, daemon=True).start()
+    else:
+        load_artifacts()
+    yield
 
-    scores = user_embeddings[u_idx] @ item_embeddings.T
-    sorted_idx = np.argsort(scores)[::-1]
+app = FastAPI(lifespan=lifespan)
 
-    # split items
-    flight_items = []
-    hotel_items = []
+def not_ready():
+    return JSONResponse({"error": "Recommender model is still loading"}, status_code=503)
 
-    for idx in sorted_idx:
-        item = item_list[idx]
+@app.get("/health")
+def health():
+    return {"status": "ok", "uptime_s": round(time.perf_counter() - _process_start, 3)}
 
-        if "→" in item:    # flight
-            flight_items.append({"item": item, "score": float(scores[idx])})
-        else:              # hotel
-            hotel_items.append({"item": item, "score": float(scores[idx])})
+@app.get("/ready")
+def ready():
+    if artifacts is None:
+        return JSONResponse({"ready": False, "load_error": str(load_error) if load_error else None},
+                            status_code=503)
+    return {"ready": True, "startup_ms": artifacts.timings}
 
-        if len(flight_items) >= top_k and len(hotel_items) >= top_k:
-            break
+def rank_top_k(scores, k):
+    """
+    Positions of the k best scores in each row of a 2-D array, best first; equal scores (e.g. the two
+    legs of a round trip) are ordered by position, i.e. item index, so the lists are deterministic.
+    Rows where argpartition cut a tie at the k-th place are re-ranked over all their tied items.
+    """
+    n = scores.shape[1]
+    if k < n:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        kth = np.take_along_axis(scores, top, axis=1).min(axis=1)
+        cut_ties = np.flatnonzero((scores >= kth[:, None]).sum(axis=1) > k)
+    else:
+        top = np.tile(np.arange(n), (len(scores), 1))
+        cut_ties = []
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    top = np.take_along_axis(top, np.lexsort((top, -top_scores), axis=1), axis=1)
+    for row in cut_ties:
+        candidates = np.flatnonzero(scores[row] >= kth[row])
+        top[row] = candidates[np.lexsort((candidates, -scores[row, candidates]))][:k]
+    return top
+
+def top_k_items(user_vector, item_type, top_k, exact=False):
+    """
+    Best `top_k` items of one type as [{"item", "score"}], scoring only that partition.
+    Uses the ANN index when there is one, falling back to exact scoring if the probed lists
+    hold fewer than top_k items.
+    """
+    positions = None
+    if item_type in artifacts.item_index and not exact:
+        positions, scores = artifacts.item_index[item_type].search(user_vector, top_k, ANN_NPROBE)
+        if len(positions) < min(top_k, len(artifacts.partition_items[item_type])):
+            positions = None
+    if positions is None:
+        all_scores = user_vector @ artifacts.partition_factors[item_type].T
+        k = min(top_k, len(all_scores))
+        if k <= 0:
+            return []
+        positions = rank_top_k(all_scores[None, :], k)[0]
+        scores = all_scores[positions]
+
+    item_ids = artifacts.partition_items[item_type][positions]
+    return [{"item": artifacts.item_list[i], "score": float(sc)} for i, sc in zip(item_ids, scores)]
+
+@app.get("/recommend")
+def recommend(user_id: int, top_k: int = 5, item_type: Optional[Literal["flight", "hotel"]] = None,
+              exact: bool = False):
+    if artifacts is None:
+        return not_ready()
+    artifacts.fold_in.sync()
+    known, user_vectors = artifacts.user_vectors([user_id])
+    if not known:
+        return {"flight_recommendations": [], "hotel_recommendations": []}
+
+    user_vector = user_vectors[0]
+    wanted = ITEM_TYPES if item_type is None else (item_type,)
+    recs = {t: top_k_items(user_vector, t, top_k, exact) if t in wanted else [] for t in ITEM_TYPES}
 
     return {
         "user_id": user_id,
-        "flight_recommendations": flight_items[:top_k],
-        "hotel_recommendations": hotel_items[:top_k],
+        "flight_recommendations": recs["flight"],
+        "hotel_recommendations": recs["hotel"],
     }
+
+# --------------------------------------------------------
+# Batch recommendations
+# --------------------------------------------------------
+
+BATCH_CHUNK_SIZE = int(os.getenv("RECOMMEND_BATCH_CHUNK", "1024"))
+
+def batch_top_k(user_vectors, item_type, top_k):
+    """Top-k (positions, scores) per row for a block of users: one matrix product + row-wise argpartition (rank_top_k)."""
+    scores = user_vectors @ artifacts.partition_factors[item_type].T
+    k = min(top_k, scores.shape[1])
+    if k <= 0:
+        return np.empty((len(scores), 0), dtype=np.int64), np.empty((len(scores), 0))
+    top = rank_top_k(scores, k)
+    return top, np.take_along_axis(scores, top, axis=1)
+
+def iter_batch_recommendations(user_ids, top_k=5, item_type=None):
+    """Yield one /recommend-shaped dict per user id, computing scores a chunk of users at a time."""
+    wanted = ITEM_TYPES if item_type is None else (item_type,)
+    for start in range(0, len(user_ids), BATCH_CHUNK_SIZE):
+        chunk = user_ids[start:start + BATCH_CHUNK_SIZE]
+        known, user_vectors = artifacts.user_vectors(chunk)
+        rows = {}
+        if known:
+            for item_type_ in wanted:
+                positions, scores = batch_top_k(user_vectors, item_type_, top_k)
+                item_ids = artifacts.partition_items[item_type_][positions]
+                for row, pos in enumerate(known):
+                    rows.setdefault(pos, {})[item_type_] = [
+                        {"item": artifacts.item_list[i], "score": float(sc)}
+                        for i, sc in zip(item_ids[row], scores[row])
+                    ]
+
+        for pos, user_id in enumerate(chunk):
+            if pos not in rows:
+                yield {"user_id": user_id, "flight_recommendations": [], "hotel_recommendations": [],
+                       "error": "unknown user"}
+                continue
+            yield {
+                "user_id": user_id,
+                "flight_recommendations": rows[pos].get("flight", []),
+                "hotel_recommendations": rows[pos].get("hotel", []),
+            }
+
+class BatchRecommendRequest(BaseModel):
+    user_ids: List[int]
+    top_k: int = 5
+    item_type: Optional[Literal["flight", "hotel"]] = None
+
+@app.post("/recommend/batch")
+def recommend_batch(req: BatchRecommendRequest):
+    """Recommendations for many users, streamed back as NDJSON (one line per requested user id)."""
+    if artifacts is None:
+        return not_ready()
+    artifacts.fold_in.sync()
+    lines = (json.dumps(rec, ensure_ascii=False) + "\n"
+             for rec in iter_batch_recommendations(req.user_ids, req.top_k, req.item_type))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+# --------------------------------------------------------
+# Incremental fold-in of new users / interactions
+# --------------------------------------------------------
+
+class InteractionsRequest(BaseModel):
+    # Each event: {"user_id", "item"} or {"user_id", "type": "flight", "from", "to", "flightType"}
+    # or {"user_id", "type": "hotel", "name", "place"}; optional "price"/"total"/"days" and "date",
+    # used by the training run's weighting scheme, or an explicit "weight" on the trained matrix's scale
+    events: List[Dict[str, Any]]
+
+@app.post("/interactions")
+def add_interactions(req: InteractionsRequest):
+    """Fold new bookings into the serving embeddings; affected users see updated recommendations immediately."""
+    if artifacts is None:
+        return not_ready()
+    result = artifacts.fold_in.add_events(req.events)
+    result["drift"] = artifacts.fold_in.drift()
+    return result
+
+@app.get("/drift")
+def drift():
+    """How far the serving state has moved from the last training run, and whether to retrain."""
+    if artifacts is None:
+        return not_ready()
+    artifacts.fold_in.sync()
+    return artifacts.fold_in.drift()
@@ -0,0 +1,69 @@
+# src/recommender_metrics.py
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def holdout_split(matrix, fraction=0.1, random_state=42):
+    """Random (train, test) split of the non-zero interactions of a user x item matrix."""
+    coo = csr_matrix(matrix).tocoo()
+    rng = np.random.default_rng(random_state)
+    is_test = rng.random(coo.nnz) < fraction
+
+    def part(mask):
+        return csr_matrix((coo.data[mask], (coo.row[mask], coo.col[mask])), shape=matrix.shape)
+
+    return part(~is_test), part(is_test)
+
+
+def ranking_metrics(user_factors, item_factors, train, test, k=10, exclude_seen=True, batch_size=1024):
+    """
+    precision@k, recall@k, NDCG@k and catalogue coverage@k over users with held-out items.
+    - `k` may be a list; every cut-off is computed from one sorted top-max(k) per user,
+    - users are scored a block at a time (one matrix product + row-wise argpartition),
+    - with `exclude_seen`, items already in `train` are removed from each user's ranking.
+    """
+    ks = sorted({k} if np.isscalar(k) else set(k))
+    max_k = min(ks[-1], item_factors.shape[0])
+    train, test = csr_matrix(train), csr_matrix(test)
+    users = np.flatnonzero(np.diff(test.indptr))
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+
+    hits_at = {kk: [] for kk in ks}
+    dcg_at = {kk: [] for kk in ks}
+    idcg_at = {kk: [] for kk in ks}
+    n_relevant = []
+    recommended = {kk: np.zeros(item_factors.shape[0], dtype=bool) for kk in ks}
+
+    for start in range(0, len(users), batch_size):
+        batch = users[start:start + batch_size]
+        scores = np.asarray(user_factors[batch] @ item_factors.T, dtype=np.float64)
+        if exclude_seen:
+            seen = train[batch]
+            scores[np.repeat(np.arange(len(batch)), np.diff(seen.indptr)), seen.indices] = -np.inf
+        top = np.argpartition(-scores, max_k - 1, axis=1)[:, :max_k] if max_k < scores.shape[1] \
+            else np.tile(np.arange(max_k), (len(batch), 1))
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+        relevant = test[batch].toarray() > 0
+        hit = np.take_along_axis(relevant, top, axis=1)
+        relevant_count = relevant.sum(axis=1)
+        n_relevant.append(relevant_count)
+        for kk in ks:
+            cut = min(kk, max_k)
+            hits_at[kk].append(hit[:, :cut].sum(axis=1))
+            dcg_at[kk].append(hit[:, :cut] @ discounts[:cut])
+            ideal = np.minimum(relevant_count, cut)
+            idcg_at[kk].append(np.cumsum(discounts[:cut])[np.maximum(ideal, 1) - 1])
+            recommended[kk][top[:, :cut].ravel()] = True
+
+    metrics = {"users": int(len(users))}
+    if not len(users):
+        return metrics
+    n_relevant = np.concatenate(n_relevant)
+    for kk in ks:
+        hits = np.concatenate(hits_at[kk])
+        metrics[f"precision@{kk}"] = float((hits / kk).mean())
+        metrics[f"recall@{kk}"] = float((hits / n_relevant).mean())
+        metrics[f"ndcg@{kk}"] = float((np.concatenate(dcg_at[kk]) / np.concatenate(idcg_at[kk])).mean())
+        metrics[f"coverage@{kk}"] = float(recommended[kk].mean())
+    return metrics
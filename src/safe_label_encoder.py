@@ -1,24 +1,91 @@
 import numpy as np
+import pandas as pd
 from sklearn.preprocessing import LabelEncoder
+from sklearn.utils.validation import check_is_fitted, column_or_1d
 
 class SafeLabelEncoder(LabelEncoder):
+    """
+    LabelEncoder that maps values not seen during fit (and missing values) to -1
+    instead of raising.
+    - transform: np.searchsorted over the sorted classes_ plus an equality check
+      (a pandas hash lookup for object arrays, where comparisons would run in Python),
+    - fit ignores missing values, so fit_transform gives them -1 like transform does,
+    - inverse_transform turns -1 back into `unknown`,
+    - to_array / from_array (and save_encoders / load_encoders) store only classes_.
+    """
+    unknown_label = -1
+
+    def fit(self, y):
+        y = column_or_1d(y, warn=True)
+        return super().fit(y[~pd.isna(y)])
+
+    def fit_transform(self, y, *args, **kwargs):
+        # Fit + transform
+        return self.fit(y).transform(y)
+
     def transform(self, X):
         # Convert values not seen during training → "unknown"
-        unknown_label = -1
-        X = np.array(X)
+        check_is_fitted(self)
+        X = np.asarray(X)
+        if X.ndim == 0:
+            X = X.reshape(1)
+        output = np.full(len(X), self.unknown_label, dtype=np.int64)
+        present = np.flatnonzero(~pd.isna(X))
+        if len(present) == 0 or len(self.classes_) == 0:
+            return output
 
-        seen = set(self.classes_)
+        values = X[present]
+        if values.dtype != object and self.classes_.dtype != object:
+            try:
+                pos = np.minimum(np.searchsorted(self.classes_, values), len(self.classes_) - 1)
+                known = self.classes_[pos] == values
+                output[present[known]] = pos[known]
+                return output
+            except TypeError:
+                pass  # values that do not compare with the classes (e.g. numbers vs strings)
+        # Python objects (e.g. strings from pandas): a hash lookup avoids per-pair Python comparisons
+        pos = pd.Index(self.classes_).get_indexer(values)
+        known = pos >= 0
+        output[present[known]] = pos[known]
+        return output
 
-        output = []
-        for item in X:
-            if item in seen:
-                output.append(super().transform([item])[0])
-            else:
-                output.append(unknown_label)
+    def inverse_transform(self, y, unknown=None):
+        """Labels -> original values; unknown_label (-1) becomes `unknown`."""
+        check_is_fitted(self)
+        y = np.asarray(y, dtype=np.int64)  # an empty list would otherwise be float64, unusable as an index
+        is_unknown = y == self.unknown_label
+        if np.any(y[~is_unknown] < 0) or np.any(y[~is_unknown] >= len(self.classes_)):
+            raise ValueError("y contains previously unseen labels")
+        if not is_unknown.any():
+            return self.classes_[y]
+        output = np.empty(len(y), dtype=object)
+        output[~is_unknown] = self.classes_[y[~is_unknown]]
+        output[is_unknown] = unknown
+        return output
 
-        return np.array(output)
+    def to_array(self):
+        """classes_ as a plain (non-object) array, storable without pickle; object classes must all be str."""
+        check_is_fitted(self)
+        classes = self.classes_
+        if classes.dtype != object:
+            return classes
+        mixed = sorted({type(c).__name__ for c in classes if not isinstance(c, str)})
+        if mixed:
+            # Casting to str would load back as different classes ("1" instead of 1) and break transform
+            raise ValueError(f"Cannot store object classes that are not all str (found {', '.join(mixed)}); "
+                             "cast the column to one type before fitting")
+        return np.asarray(classes, dtype=str)
 
-    def fit_transform(self, X, *args, **kwargs):
-        # Fit + transform
-        result = super().fit_transform(X)
-        return result
+    @classmethod
+    def from_array(cls, classes):
+        encoder = cls()
+        encoder.classes_ = np.asarray(classes)
+        return encoder
+
+def save_encoders(path, encoders):
+    """Write {column: SafeLabelEncoder} to one .npz (one classes array per column)."""
+    np.savez_compressed(path, **{column: encoder.to_array() for column, encoder in encoders.items()})
+
+def load_encoders(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {column: SafeLabelEncoder.from_array(data[column]) for column in data.files}
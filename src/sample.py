@@ -1,11 +1,12 @@
 import pandas as pd
+from schema import read_table
 
-hotels = pd.read_csv("data/hotels.csv")
-flights = pd.read_csv("data/flights.csv")
+hotels = read_table("hotels", "data/hotels.csv")
+flights = read_table("flights", "data/flights.csv")
 
 items = pd.concat([
     hotels['name'].astype(str),
-    flights['from'].astype(str) + " → " + flights['to'].astype(str) + " — " + flights['flightType']
+    flights['from'].astype(str) + " → " + flights['to'].astype(str) + " — " + flights['flightType'].astype(str)
 ])
 
 print("Unique item count:", items.nunique())
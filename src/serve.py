@@ -0,0 +1,99 @@
+# src/serve.py
+"""
+Production serving entry point for the price API.
+
+Runs src/app.py under a gunicorn pre-fork worker pool:
+- the models (price pipeline, gender classifier) are loaded once in the parent process
+  (no per-worker load/timeout),
+- workers are forked afterwards and share the loaded pipeline copy-on-write,
+- each worker starts its model watcher when forked, after first catching up on any
+  /admin/reload done since the parent loaded (e.g. a worker respawned after max-requests),
+- SIGTERM triggers a graceful shutdown that lets in-flight requests finish.
+
+Usage:
+    python src/serve.py --bind 0.0.0.0:5050 --workers 4 --threads 4
+"""
+import os
+import gc
+import argparse
+import logging
+
+from gunicorn.app.base import BaseApplication
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def bind_port(bind):
+    """Port of a host:port (or [ipv6]:port) bind; None for unix:/path.sock, fd://n and the like."""
+    if bind.startswith(("unix:", "fd://")):
+        return None
+    port = bind.rsplit(":", 1)[-1] if ":" in bind else ""
+    return int(port) if port.isdigit() else None
+
+
+class VoyageServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        # Model loading is deferred so it runs synchronously here, in the parent, before forking
+        os.environ["APP_DEFER_MODEL_LOAD"] = "1"
+        import app as voyage_app
+
+        voyage_app.try_load_model()
+        if not voyage_app.model_loaded:
+            logger.warning("⚠️ Starting workers without a model; /ready will report 503.")
+        voyage_app.try_load_gender_classifier()
+        voyage_app.app.config["APP_PORT"] = bind_port(self.options["bind"])
+
+        # Move everything loaded so far out of the GC's reach so collections in
+        # the workers don't touch (and un-share) the model's pages
+        gc.freeze()
+        return voyage_app.app
+
+
+def post_fork(server, worker):
+    # Runs in the new worker before it accepts requests
+    import app as voyage_app
+
+    voyage_app.start_model_watcher(check_now=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Voyage price API with a pre-forked worker pool")
+    parser.add_argument("--bind", default=os.getenv("APP_BIND", f"0.0.0.0:{os.getenv('FLASK_PORT', '5050')}"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("APP_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("APP_THREADS", "4")))
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("APP_KEEP_ALIVE", "5")))
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("APP_TIMEOUT", "60")))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("APP_GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("APP_MAX_REQUESTS", "0")))
+    args = parser.parse_args(argv)
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread" if args.threads > 1 else "sync",
+        "keepalive": args.keep_alive,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10 if args.max_requests else 0,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "accesslog": "-",
+    }
+    logger.info("🚀 Starting gunicorn: %s", options)
+    VoyageServer(options).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# src/sharded_forest.py
+"""
+Out-of-core, multi-process training of the price forest.
+
+1. fit_preprocessor: prepare_X_y + the ColumnTransformer are fitted on a uniform row sample
+   drawn part by part from the column store (all rows if the store is smaller than the sample).
+2. write_shards: every part of the store is transformed with that preprocessor and its rows are
+   scattered at random over n shard directories (float32 .npy pieces: the trees compare features
+   as float32 anyway, so this does not change any split).
+3. fit_shards: each shard is fitted in its own worker process with its share of the trees
+   (different seeds per shard) and written to <shard>/forest.joblib.
+4. merge_forests: the per-shard estimators are concatenated into one RandomForestRegressor,
+   which predicts the mean over all trees like a forest trained in one process.
+
+Only one part of the store (parent) or one shard (each worker) is in memory at a time. Shards
+are plain directories, so fit_shard can also be run on other machines against shared storage.
+
+Usage (through train_regression.py):
+    python src/train_regression.py --prepared data/prepared --shards 8 --shard-workers 4
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from features import limit_categories, prepare_X_y
+from preprocess import load_prepared, read_meta
+from preprocess_cache import load_matrix, save_matrix
+
+
+def sample_rows(prepared_dir, columns, n_rows, random_state=42):
+    """Uniform sample of about n_rows rows of the store, read one part at a time."""
+    meta = read_meta(prepared_dir)
+    fraction = min(1.0, n_rows / max(meta["n_rows"], 1))
+    rng = np.random.default_rng(random_state)
+    samples = []
+    for part in range(meta["n_parts"]):
+        df = load_prepared(prepared_dir, columns, parts=[part])
+        samples.append(df if fraction >= 1.0 else df[rng.random(len(df)) < fraction])
+    return pd.concat(samples, ignore_index=True)
+
+
+def fit_preprocessor(prepared_dir, columns, target="price", top_k=50, encoding="onehot",
+                     n_rows=100_000, random_state=42):
+    """
+    (fitted preprocessor, num_cols, cat_cols, kept categories per column, sample X, sample y).
+    The kept categories reproduce prepare_X_y's top_k / "OTHER" mapping on every shard.
+    """
+    sample = sample_rows(prepared_dir, columns, n_rows, random_state)
+    X, y, preprocessor, num_cols, cat_cols = prepare_X_y(sample, target=target, top_k=top_k, encoding=encoding)
+    preprocessor.fit(X, y)
+    keep = {c: pd.Index(X[c].unique()) for c in cat_cols}
+    return preprocessor, num_cols, cat_cols, keep, X, y.to_numpy()
+
+
+def write_shards(prepared_dir, columns, out_dir, preprocessor, num_cols, cat_cols, keep, n_shards,
+                 target="price", random_state=42):
+    """Transform the store part by part and scatter its rows over n_shards directories; returns their paths."""
+    if os.path.isdir(out_dir) and os.listdir(out_dir):
+        raise ValueError(f"{out_dir} is not empty; shards are written to a fresh directory")
+    meta = read_meta(prepared_dir)
+    shard_dirs = [os.path.join(out_dir, f"shard-{s:03d}") for s in range(n_shards)]
+    for part in range(meta["n_parts"]):
+        df = load_prepared(prepared_dir, columns, parts=[part]).dropna(subset=[target])
+        X = limit_categories(df[num_cols + cat_cols].copy(), keep)
+        Xt = preprocessor.transform(X)
+        Xt = Xt.astype(np.float32) if sparse.issparse(Xt) else np.asarray(Xt, dtype=np.float32)
+        y = df[target].to_numpy()
+        shard_of = np.random.default_rng(random_state + part).integers(n_shards, size=len(df))
+        for s, shard_dir in enumerate(shard_dirs):
+            rows = np.flatnonzero(shard_of == s)
+            piece_dir = os.path.join(shard_dir, f"part-{part:05d}")
+            os.makedirs(piece_dir, exist_ok=True)
+            save_matrix(piece_dir, Xt[rows])
+            np.save(os.path.join(piece_dir, "y.npy"), y[rows])
+        print(f"INFO: Sharded part {part + 1}/{meta['n_parts']} ({len(df)} rows)")
+    return shard_dirs
+
+
+def load_shard(shard_dir):
+    pieces = sorted(p for p in os.listdir(shard_dir) if p.startswith("part-"))
+    Xs = [load_matrix(os.path.join(shard_dir, p)) for p in pieces]
+    y = np.concatenate([np.load(os.path.join(shard_dir, p, "y.npy")) for p in pieces])
+    X = sparse.vstack(Xs, format="csr") if sparse.issparse(Xs[0]) else np.concatenate(Xs)
+    return X, y
+
+
+def fit_shard(shard_dir, build, params):
+    """Fit build(params) on one shard, save it next to the shard; returns (path, rows, fit seconds)."""
+    X, y = load_shard(shard_dir)
+    start = time.perf_counter()
+    forest = build(params).fit(X, y)
+    fit_s = time.perf_counter() - start
+    path = os.path.join(shard_dir, "forest.joblib")
+    joblib.dump(forest, path)
+    return path, len(y), fit_s
+
+
+def split_trees(n_estimators, n_shards):
+    """Number of trees per shard, as even as possible (earlier shards get the remainder)."""
+    return [n_estimators // n_shards + (s < n_estimators % n_shards) for s in range(n_shards)]
+
+
+def fit_shards(shard_dirs, build, n_estimators, workers=None, random_state=42):
+    """Fit every shard in a process pool; returns [(forest path, rows, fit seconds)] in shard order."""
+    params = [{"n_estimators": trees, "random_state": random_state + s}
+              for s, trees in enumerate(split_trees(n_estimators, len(shard_dirs)))]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fit_shard, shard_dirs, [build] * len(shard_dirs), params))
+
+
+def merge_forests(forests):
+    """One forest whose estimators_ are those of every shard forest, in shard order."""
+    merged = forests[0]
+    merged.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+    merged.n_estimators = len(merged.estimators_)
+    return merged
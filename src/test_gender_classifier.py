@@ -1,29 +1,16 @@
-import mlflow
-import pickle
-import pandas as pd
-import numpy as np
+from gender_classifier import GENDER_MODEL_DIR, GenderClassifier
 
-print("\n📌 Loading model from MLflow Registry...\n")
+print("\n📌 Loading model from the local MLflow artifact copy...\n")
 
 # ---------------------------------------------------------------------
-# 1️⃣ Load the model directly from your real artifact path
+# 1️⃣ Load the model + encoders (model/gender_classifier, written by train_gender_classifier.py)
 # ---------------------------------------------------------------------
-model_path = r"mlruns/634045032032732958/models/m-fd5a4e5e6c614f9185d7f2ac2a36cd1f/artifacts"
-model = mlflow.pyfunc.load_model(model_path)
+classifier = GenderClassifier.load(GENDER_MODEL_DIR)
 
 print("✔ Model loaded successfully!\n")
 
 # ---------------------------------------------------------------------
-# 2️⃣ Load encoders
-# ---------------------------------------------------------------------
-gender_map = pickle.load(open("encoders/gender_encoder.pkl", "rb"))
-name_vectorizer = pickle.load(open("encoders/name_vectorizer.pkl", "rb"))
-
-# Reverse map: 0→male , 1→female
-gender_inv = {v: k for k, v in gender_map.items()}
-
-# ---------------------------------------------------------------------
-# 3️⃣ Test samples
+# 2️⃣ Test samples
 # ---------------------------------------------------------------------
 samples = [
     ("Joseph Holsten", 37, "female"),
@@ -36,21 +23,13 @@ print(f"{'Name':20} | {'Predicted':10} | {'Actual':8} | Result")
 print("-" * 60)
 
 # ---------------------------------------------------------------------
-# 4️⃣ Predict loop
+# 3️⃣ Predict the whole batch at once (one vectorizer call, one model call)
 # ---------------------------------------------------------------------
-for name, age, actual in samples:
-
-    first_name = name.split()[0]
-
-    # 🔥 FIX: batch transform
-    v_name = name_vectorizer.transform_batch([first_name])
-
-    # final input vector → concatenate name_vec + age
-    X = np.hstack([v_name, np.array([[age]])])
-
-    pred = model.predict(X)[0]
-    predicted_gender = gender_inv[pred]
+names = [name for name, _, _ in samples]
+ages = [age for _, age, _ in samples]
+predicted, _ = classifier.predict(names, ages)
 
+for (name, age, actual), predicted_gender in zip(samples, predicted):
     result = "✅ Correct" if predicted_gender == actual else "❌ Wrong"
 
     print(f"{name:20} | {predicted_gender:10} | {actual:8} | {result}")
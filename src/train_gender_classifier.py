@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 import mlflow
 import mlflow.sklearn
@@ -7,16 +6,18 @@ import os
 from sklearn.model_selection import train_test_split
 from xgboost import XGBClassifier
 from name_vectorizer import NameVectorizer
+from gender_classifier import export_model
+from schema import read_table
 
 # Load dataset
-df = pd.read_csv("data/users_cleaned.csv")
+df = read_table("users", "data/users_cleaned.csv")
 
 # Extract first name only (important!)
 df["first_name"] = df["name"].apply(lambda x: x.split()[0])
 
-# Setup NameVectorizer
-vectorizer = NameVectorizer()
-X_name = vectorizer.transform_batch(df["first_name"][:1000])
+# Setup NameVectorizer (NAME_FEATURES=ngrams for hashed character bigrams/trigrams)
+vectorizer = NameVectorizer(mode=os.getenv("NAME_FEATURES", "chars"))
+X_name = vectorizer.transform_batch(df["first_name"].tolist())
 
 
 # Prepare additional features
@@ -27,7 +28,7 @@ X = np.hstack([X_name, X_age])
 
 # Encode target (gender)
 gender_map = {"male": 0, "female": 1}
-y = df["gender"].map(gender_map).values
+y = df["gender"].map(gender_map).to_numpy()
 
 # Save gender encoder
 os.makedirs("encoders", exist_ok=True)
@@ -60,6 +61,9 @@ mlflow.set_experiment("gender-classifier-v2")
 
 with mlflow.start_run():
     mlflow.log_metric("accuracy", accuracy)
-    mlflow.sklearn.log_model(model, "model")
+    model_info = mlflow.sklearn.log_model(model, "model")
+
+# Local copy of the logged artifact, loaded by the /classify/gender endpoint
+print(f"✔ Model copied to {export_model(model_info.model_uri)}")
 
 print(f"✔ Training complete! Accuracy = {accuracy:.4f}")
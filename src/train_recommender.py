@@ -1,24 +1,139 @@
 import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
-from scipy.sparse import csr_matrix, save_npz
+from scipy.sparse import save_npz
 from sklearn.decomposition import TruncatedSVD
 import pickle
+from ann_index import IVFIndex
+from als_engine import ImplicitALS
+from interaction_weights import WEIGHTINGS, FoldInWeighting, RecencyClock, interaction_totals, weight_interactions
+from recommender_metrics import holdout_split, ranking_metrics
+from schema import read_table
+
+FLIGHT_KEYS = ["from", "to", "flightType"]
+HOTEL_KEYS = ["name", "place"]
+# Spend per booking: flight ticket price, hotel stay total (price * days)
+FLIGHT_SPEND = "price"
+HOTEL_SPEND = "total"
+ENGINES = ("svd", "als")
 
 # --------------------------------------------------------
-# Build item strings for flights & hotels
+# Integer encoding of users and items
 # --------------------------------------------------------
 
-def build_items(flights_df, hotels_df):
-    # Flights item format: "From → To — flightType"
-    flights_df["item"] = (
-        flights_df["from"] + " → " + flights_df["to"] + " — " + flights_df["flightType"]
-    )
+class Vocabulary:
+    """Growing value -> code table, so chunks can be encoded as they are read."""
+
+    def __init__(self):
+        self.values = pd.Index([])
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, values):
+        if len(self.values) == 0:
+            # First chunk fixes the index dtype (int64 keys hash much faster than object)
+            self.values = pd.Index(pd.unique(values))
+        codes = self.values.get_indexer(values)
+        new = codes < 0
+        if new.any():
+            self.values = self.values.append(pd.Index(pd.unique(values[new])))
+            codes[new] = self.values.get_indexer(values[new])
+        return codes
+
+def read_interactions(table, path, key_cols, spend_col, user_vocab, clock, chunksize):
+    """
+    Encode one bookings file chunk by chunk, without building item strings.
+    - each key column (e.g. from/to/flightType) gets its own Vocabulary,
+    - the per-column codes are packed into one int64 key, itself encoded into an item code,
+    - duplicates within a chunk are collapsed into (user, item) pairs with their
+      booking count, total spend and recency-decay sum (see interaction_weights).
+    Only bookings without a userCode or an item key are dropped: a missing spend counts as 0
+    and a booking without a date gets the neutral recency weight of the latest booking ("undated").
+    Returns (user_codes, item_codes, aggregates, item_vocab, key_vocabs).
+    """
+    key_vocabs = {col: Vocabulary() for col in key_cols}
+    item_vocab = Vocabulary()
+    bits = 63 // len(key_cols)
+    users, items = [], []
+    aggregates = {"count": [], "spend": [], "recency": [], "undated": []}
+    required = ["userCode"] + key_cols
+    dropped = 0
 
-    # Hotels item format: "HotelName — Place"
-    hotels_df["item"] = hotels_df["name"] + " — " + hotels_df["place"]
+    for chunk in read_table(table, path, usecols=["userCode", spend_col, "date"] + key_cols, chunksize=chunksize):
+        incomplete = chunk[required].isna().any(axis=1).to_numpy()
+        if incomplete.any():
+            dropped += int(incomplete.sum())
+            chunk = chunk[~incomplete]
+        packed = np.zeros(len(chunk), dtype=np.int64)
+        for col in key_cols:
+            # Key columns are categoricals: encode the chunk's categories once, then index by code
+            codes = key_vocabs[col].encode(chunk[col].cat.categories.to_numpy())[chunk[col].cat.codes.to_numpy()]
+            if len(key_vocabs[col]) >= 1 << bits:
+                raise ValueError(f"Too many distinct values in column '{col}' to pack item keys")
+            packed = (packed << bits) | codes
+        item_codes = item_vocab.encode(packed)
+        user_codes = user_vocab.encode(chunk["userCode"].to_numpy())
 
-    return flights_df, hotels_df
+        dated = chunk["date"].notna().to_numpy()
+        recency = np.zeros(len(chunk))
+        recency[dated] = clock.weights(chunk["date"].to_numpy()[dated].astype("datetime64[D]").astype(np.int64))
+
+        pairs, inverse = np.unique(user_codes.astype(np.int64) << 32 | item_codes, return_inverse=True)
+        users.append((pairs >> 32).astype(np.int32))
+        items.append((pairs & 0xFFFFFFFF).astype(np.int32))
+        aggregates["count"].append(np.bincount(inverse, minlength=len(pairs)).astype(np.float64))
+        aggregates["spend"].append(np.bincount(inverse, weights=chunk[spend_col].fillna(0.0).to_numpy(np.float64),
+                                               minlength=len(pairs)))
+        aggregates["recency"].append(np.bincount(inverse, weights=recency, minlength=len(pairs)))
+        aggregates["undated"].append(np.bincount(inverse, weights=(~dated).astype(np.float64), minlength=len(pairs)))
+
+    print(f"{table}: dropped {dropped} bookings without a userCode or {'/'.join(key_cols)}")
+    return (np.concatenate(users), np.concatenate(items),
+            {name: np.concatenate(parts) for name, parts in aggregates.items()},
+            item_vocab, key_vocabs)
+
+def build_items(item_vocab, key_vocabs, key_cols, template):
+    """Item strings (e.g. "From → To — flightType", "HotelName — Place") for every item code, built once at export."""
+    bits = 63 // len(key_cols)
+    packed = item_vocab.values.to_numpy(dtype=np.int64)
+    parts = {}
+    for col in reversed(key_cols):
+        parts[col] = key_vocabs[col].values.to_numpy()[packed & ((1 << bits) - 1)].astype(str)
+        packed = packed >> bits
+    return [template.format(*row) for row in zip(*(parts[col] for col in key_cols))]
+
+# --------------------------------------------------------
+# Factorization engines
+# --------------------------------------------------------
+
+def fit_engine(engine, matrix, args):
+    """Fit one engine; returns (user_factors, item_factors, fold-in projection or None, fitted model)."""
+    if engine == "als":
+        als = ImplicitALS(n_factors=args.factors, regularization=args.als_reg, alpha=args.als_alpha,
+                          iterations=args.als_iterations, n_threads=args.threads).fit(matrix)
+        return als.user_factors_, als.item_factors_, als.projection(), als
+    svd = TruncatedSVD(n_components=args.factors, random_state=42)
+    user_factors = svd.fit(matrix).transform(matrix)
+    # svd.transform(x) = x @ components_.T, so the item factors are their own fold-in projection
+    return user_factors, svd.components_.T, None, svd
+
+def compare_engines(matrix, args):
+    """Fit each engine on a random 90% of the interactions and score the held-out 10%."""
+    train, test = holdout_split(matrix, fraction=0.1)
+    print(f"\nEngine comparison ({args.weighting} weights, {test.nnz} held-out interactions):")
+    for engine in ENGINES:
+        start = time.perf_counter()
+        user_factors, item_factors, _, _ = fit_engine(engine, train, args)
+        elapsed = time.perf_counter() - start
+        metrics = ranking_metrics(user_factors, item_factors, train, test, k=args.eval_k)
+        scores = ", ".join(f"{name}={value:.4f}" for name, value in metrics.items() if "@" in name)
+        print(f"  {engine}: train {elapsed:.2f}s, {scores}")
 
 # --------------------------------------------------------
 # Main training function
@@ -28,23 +143,35 @@ def main(args):
 
     print("\nLoading datasets...")
 
-    users = pd.read_csv(args.users)
-    flights = pd.read_csv(args.flights)
-    hotels = pd.read_csv(args.hotels)
+    # Users are the ones with bookings, so users.csv itself is not read
+    user_vocab = Vocabulary()
+    clock = RecencyClock(args.half_life_days)
+    f_users, f_items, f_aggs, f_vocab, f_keys = read_interactions(
+        "flights", args.flights, FLIGHT_KEYS, FLIGHT_SPEND, user_vocab, clock, args.chunksize)
+    h_users, h_items, h_aggs, h_vocab, h_keys = read_interactions(
+        "hotels", args.hotels, HOTEL_KEYS, HOTEL_SPEND, user_vocab, clock, args.chunksize)
 
-    flights, hotels = build_items(flights, hotels)
+    print("Total interactions:", int(f_aggs["count"].sum() + h_aggs["count"].sum()))
 
-    # Combine interactions from flights & hotels
-    interactions = pd.concat([
-        flights[["userCode", "item"]],
-        hotels[["userCode", "item"]],
-    ], ignore_index=True)
+    # Item strings only for the unique items; flights come first, hotels after
+    n_flight_items = len(f_vocab)
+    item_names = np.asarray(
+        build_items(f_vocab, f_keys, FLIGHT_KEYS, "{} → {} — {}")
+        + build_items(h_vocab, h_keys, HOTEL_KEYS, "{} — {}"),
+        dtype=str,
+    )
 
-    print("Total interactions:", len(interactions))
+    # Sorted users / items, as the API looks both up by binary search
+    user_codes = user_vocab.values.to_numpy(dtype=np.int64)
+    user_order = np.argsort(user_codes, kind="stable")
+    user_rank = np.empty_like(user_order)
+    user_rank[user_order] = np.arange(len(user_order))
+    item_order = np.argsort(item_names, kind="stable")
+    item_rank = np.empty_like(item_order)
+    item_rank[item_order] = np.arange(len(item_order))
 
-    # Unique users and items
-    user_list = sorted(interactions["userCode"].unique())
-    item_list = sorted(interactions["item"].unique())
+    user_list = user_codes[user_order].tolist()
+    item_list = item_names[item_order].tolist()
 
     print("Unique items:", len(item_list))
     print("Unique users:", len(user_list))
@@ -53,23 +180,34 @@ def main(args):
     user_to_idx = {u: i for i, u in enumerate(user_list)}
     item_to_idx = {it: i for i, it in enumerate(item_list)}
 
-    # Build sparse matrix
-    rows = interactions["userCode"].map(user_to_idx)
-    cols = interactions["item"].map(item_to_idx)
-    data = np.ones(len(interactions))
+    # Build the weighted sparse matrix; duplicate (user, item) pairs across chunks are summed
+    rows = user_rank[np.concatenate([f_users, h_users])]
+    cols = item_rank[np.concatenate([f_items, h_items + n_flight_items])]
+    aggregates = {name: np.concatenate([f_aggs[name], h_aggs[name]]) for name in f_aggs}
 
-    matrix = csr_matrix(
-        (data, (rows, cols)),
-        shape=(len(user_list), len(item_list))
+    matrix = weight_interactions(
+        rows, cols, aggregates, shape=(len(user_list), len(item_list)),
+        scheme=args.weighting, recency_scale=clock.scale(),
     )
+    print(f"Weighting: {args.weighting}")
 
-    # Train SVD model
-    svd = TruncatedSVD(n_components=50, random_state=42)
-    svd.fit(matrix)
+    # The scheme's state (idf, recency origin, ...) for weighting folded-in interactions in the API
+    counts = None
+    if args.weighting in ("tfidf", "bm25"):
+        counts = weight_interactions(rows, cols, aggregates, shape=matrix.shape, scheme="count")
+    weighting = FoldInWeighting.fit(args.weighting, counts, args.half_life_days, clock.latest)
+
+    if args.compare_engines:
+        compare_engines(matrix, args)
+
+    # Train the selected engine on all interactions
+    start = time.perf_counter()
+    user_factors, item_factors, projection, model = fit_engine(args.engine, matrix, args)
+    print(f"\nTrained {args.engine} in {time.perf_counter() - start:.2f}s")
 
     # Save all models and maps
-    with open("models/recommender_svd.pkl", "wb") as f:
-        pickle.dump(svd, f)
+    with open(f"models/recommender_{args.engine}.pkl", "wb") as f:
+        pickle.dump(model, f)
 
     with open("models/user_to_idx.pkl", "wb") as f:
         pickle.dump(user_to_idx, f)
@@ -86,20 +224,98 @@ def main(args):
     # SAVE actual matrix for API use
     save_npz("models/interactions.npz", matrix)
 
+    # Pickle-free serving artifacts: float32 factors + sorted id / item-name tables,
+    # opened by the API with np.load(mmap_mode="r")
+    user_factors = user_factors.astype(np.float32)
+    item_factors = np.ascontiguousarray(item_factors.astype(np.float32))
+    np.save("models/user_factors.npy", user_factors)
+    np.save("models/item_factors.npy", item_factors)
+    np.save("models/user_ids.npy", user_codes[user_order])
+    np.save("models/item_names.npy", item_names[item_order])
+
+    # Fold-in projection for the API when it differs from the item factors (ALS)
+    if projection is not None:
+        np.save("models/item_projection.npy", projection.astype(np.float32))
+    elif os.path.exists("models/item_projection.npy"):
+        os.remove("models/item_projection.npy")
+
+    # Per-type partitions: flight/hotel item indices and their factor matrices,
+    # so the API scores each type separately without string checks
+    is_flight = item_order < n_flight_items
+    partitions = {"flight": np.flatnonzero(is_flight), "hotel": np.flatnonzero(~is_flight)}
+
+    for item_type, item_idx in partitions.items():
+        np.save(f"models/{item_type}_item_idx.npy", item_idx)
+        np.save(f"models/{item_type}_item_factors.npy", np.ascontiguousarray(item_factors[item_idx]))
+
+        # ANN index over the partition's factors for fast top-k retrieval in the API
+        item_index = IVFIndex.build(item_factors[item_idx], n_lists=args.ann_lists)
+        item_index.save(f"models/{item_type}_item_ivf.npz")
+        print(f"{item_type}: {len(item_idx)} items, IVF index with {item_index.n_lists} lists")
+
+    # Identifies these factors: the API tags fold-in events with it and ignores events
+    # folded onto an earlier run (their bookings are in this run's training data)
+    training_run = {
+        "run_id": uuid.uuid4().hex,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "engine": args.engine,
+        "weighting": args.weighting,
+        "weighting_params": weighting.params(),
+        "n_users": len(user_list),
+        "n_items": len(item_list),
+    }
+    with open("models/training_run.json", "w", encoding="utf-8") as f:
+        json.dump(training_run, f, indent=2)
+    if weighting.item_idf is not None:
+        np.save("models/item_idf.npy", weighting.item_idf)
+    elif os.path.exists("models/item_idf.npy"):
+        os.remove("models/item_idf.npy")
+    # Per user and item booking/spend/recency totals, so the API re-weights a trained user's
+    # whole row when new bookings are folded in (log_spend and bm25 are not additive)
+    indptr, indices, totals = interaction_totals(rows, cols, aggregates, matrix.shape, clock.scale())
+    np.savez("models/interaction_totals.npz", indptr=indptr, indices=indices, totals=totals)
+
     print("\nSaved:")
-    print("models/recommender_svd.pkl")
+    print(f"models/recommender_{args.engine}.pkl")
     print("models/user_to_idx.pkl")
     print("models/item_to_idx.pkl")
     print("models/user_list.pkl")
     print("models/item_list.pkl")
     print("models/interactions.npz")
+    print("models/user_factors.npy")
+    print("models/item_factors.npy")
+    print("models/user_ids.npy")
+    print("models/item_names.npy")
+    print("models/training_run.json")
+    print("models/interaction_totals.npz")
+    if weighting.item_idf is not None:
+        print("models/item_idf.npy")
+    if projection is not None:
+        print("models/item_projection.npy")
+    for item_type in partitions:
+        print(f"models/{item_type}_item_idx.npy")
+        print(f"models/{item_type}_item_factors.npy")
+        print(f"models/{item_type}_item_ivf.npz")
 
     print("\nTraining completed successfully!")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--users")
+    parser.add_argument("--users", help="unused; users are taken from the bookings")
     parser.add_argument("--flights")
     parser.add_argument("--hotels")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="CSV rows read per chunk")
+    parser.add_argument("--weighting", choices=WEIGHTINGS, default="count", help="interaction weights")
+    parser.add_argument("--half-life-days", type=float, default=180.0, help="recency weighting half-life")
+    parser.add_argument("--engine", choices=ENGINES, default="svd", help="factorization saved for serving")
+    parser.add_argument("--factors", type=int, default=50)
+    parser.add_argument("--als-reg", type=float, default=0.1)
+    parser.add_argument("--als-alpha", type=float, default=40.0, help="ALS confidence = 1 + alpha * weight")
+    parser.add_argument("--als-iterations", type=int, default=15)
+    parser.add_argument("--threads", type=int, default=None, help="ALS solver threads (default: all cores)")
+    parser.add_argument("--compare-engines", action="store_true",
+                        help="report training time and ranking metrics of every engine on a holdout split")
+    parser.add_argument("--eval-k", type=int, default=10)
+    parser.add_argument("--ann-lists", type=int, default=None, help="IVF lists (default: sqrt(n_items))")
     args = parser.parse_args()
     main(args)
@@ -1,18 +1,181 @@
 import argparse
-import pandas as pd
 import json
 import os
+import shutil
+import tempfile
+import time
+from functools import partial
 import joblib
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor
-from features import prepare_X_y
-from preprocess import prepare_dataset
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from features import ENCODINGS, categorical_mask, prepare_X_y
+from preprocess import prepare_dataset, load_prepared
+from preprocess_cache import CACHE_DIR, PreprocessCache, prepare_features
+from hyperparam_search import SEARCH_MODES, SEARCH_SPACES, search, select_best
+from sharded_forest import fit_preprocessor, fit_shards, merge_forests, write_shards
 
 import mlflow
 import mlflow.sklearn
 
 
-def run_train(users_csv, flights_csv, hotels_csv=None):
+def training_columns(columns_path="src/columns.json"):
+    with open(columns_path, "r", encoding="utf-8") as f:
+        info = json.load(f)
+    return info["num_cols"] + info["cat_cols"] + [info.get("target", "price")]
+
+
+def load_training_frame(users_csv, flights_csv, hotels_csv=None, prepared_dir=None):
+    """
+    Merged training frame: from a column store written by `python src/preprocess.py`
+    (reading only the columns listed in columns.json), or by merging the CSVs in memory.
+    """
+    if prepared_dir:
+        columns = training_columns()
+        print(f"INFO: Loading {len(columns)} columns from {prepared_dir}")
+        return load_prepared(prepared_dir, columns)
+    return prepare_dataset(users_csv, flights_csv, hotels_csv)
+
+
+def build_regressor(model, num_cols, cat_cols, encoding, params=None):
+    """
+    (regressor, params) for --model, with `params` overriding the defaults:
+    - rf: RandomForestRegressor on dense or CSR one-hot; ordinal codes are rejected, the forest
+      would split on arbitrary category codes as if they were ordered numbers,
+    - hgb: HistGradientBoostingRegressor; with the ordinal encoding the code columns are
+      declared categorical, so no one-hot block is built at all.
+    """
+    if model == "rf" and encoding == "ordinal":
+        raise ValueError("--model rf does not support --encoding ordinal (codes would be split on as numbers); "
+                         "use --encoding onehot/sparse or --model hgb")
+    if model == "rf":
+        params = {"n_estimators": 200, "max_depth": 10, "random_state": 42, **(params or {})}
+        return RandomForestRegressor(**params), params
+    params = {"max_iter": 300, "learning_rate": 0.1, "max_leaf_nodes": 63, "random_state": 42, **(params or {})}
+    categorical = categorical_mask(num_cols, cat_cols) if encoding == "ordinal" else None
+    return HistGradientBoostingRegressor(categorical_features=categorical, **params), params
+
+
+def search_regressor(params, model, num_cols, cat_cols, encoding):
+    # Module-level so hyperparam_search can send it to its worker processes
+    return build_regressor(model, num_cols, cat_cols, encoding, params)[0]
+
+
+def run_search(df, model, num_cols, cat_cols, encoding, mode, workers, max_latency_ms=None):
+    """
+    Run the hyperparameter search on the merged frame, logging each trial as a nested MLflow run;
+    returns the selected trial. Features are prepared on the search's training rows only.
+    """
+    def log_trial(result):
+        with mlflow.start_run(run_name=f"trial_{result['n_rows']}_rows", nested=True):
+            mlflow.log_params({**result["params"], "model": model, "encoding": encoding, "n_rows": result["n_rows"]})
+            mlflow.log_metrics({k: float(v) for k, v in result.items() if k not in ("params", "n_rows")})
+        print(f"INFO: trial {result['params']} on {result['n_rows']} rows: val_r2={result['val_r2']:.4f} "
+              f"fit={result['fit_seconds']:.1f}s predict_1={result['predict_1_ms']:.2f}ms")
+
+    build = partial(search_regressor, model=model, num_cols=num_cols, cat_cols=cat_cols, encoding=encoding)
+    prepare = partial(prepare_X_y, target="price", top_k=50, encoding=encoding)
+    results = search(df, prepare, build, SEARCH_SPACES[model], target="price", mode=mode, workers=workers,
+                     on_trial=log_trial)
+    best = select_best(results, max_latency_ms)
+    mlflow.log_metrics({f"best_{k}": float(v) for k, v in best.items() if k not in ("params", "n_rows")})
+    mlflow.log_metric("search_trials", len(results))
+    print(f"INFO: Selected {best['params']} (val_r2={best['val_r2']:.4f}, predict_1={best['predict_1_ms']:.2f}ms)")
+    return best
+
+
+def save_model(pipeline, num_cols, cat_cols):
+    """Write columns.json + model.pkl for app.py and log the pipeline to the active MLflow run."""
+    # --- Save columns.json ---
+    os.makedirs("src", exist_ok=True)
+    columns_info = {"num_cols": num_cols, "cat_cols": cat_cols, "target": "price"}
+    with open("src/columns.json", "w", encoding="utf-8") as f:
+        json.dump(columns_info, f, indent=2)
+    print("INFO: columns.json saved in src/")
+
+    # --- Save model locally ---
+    model_dir = "model/voyage_model/1"
+    os.makedirs(model_dir, exist_ok=True)
+    model_path = os.path.join(model_dir, "model.pkl")
+    joblib.dump(pipeline, model_path)
+    print(f"INFO: Model saved at {model_path}")
+    # Keep a copy of columns.json next to the model so the API reloads both together
+    with open(os.path.join(model_dir, "columns.json"), "w", encoding="utf-8") as f:
+        json.dump(columns_info, f, indent=2)
+
+    # --- Log model to MLflow ---
+    mlflow.sklearn.log_model(
+        sk_model=pipeline,
+        artifact_path="model",
+        registered_model_name="VoyagePricePredictor"
+    )
+
+    print("INFO: Model logged to MLflow successfully.")
+
+
+def run_train_sharded(prepared_dir, shards, workers=None, encoding="onehot", sample_rows=100_000, shard_dir=None):
+    """
+    Out-of-core training (see src/sharded_forest.py): the column store is transformed part by part
+    into `shards` on-disk shards, each worker process fits its share of the trees on one shard,
+    and the trees are merged into one RandomForestRegressor in the usual model.pkl pipeline.
+    """
+    # Every shard fits at least one tree: check before the (long) shard writing, not in a worker
+    n_estimators = build_regressor("rf", [], [], encoding)[1]["n_estimators"]
+    if not 1 <= shards <= n_estimators:
+        raise ValueError(f"--shards must be between 1 and the forest's n_estimators ({n_estimators}), got {shards}")
+
+    print("INFO: [MLflow] Starting sharded model training...")
+
+    mlflow.set_tracking_uri("http://localhost:5000")
+    mlflow.set_experiment("Voyage Analytics Model")
+
+    with mlflow.start_run(run_name="RandomForest_Sharded_Training"):
+        columns = training_columns()
+        start = time.perf_counter()
+        preprocessor, num_cols, cat_cols, keep, X_sample, y_sample = fit_preprocessor(
+            prepared_dir, columns, target="price", top_k=50, encoding=encoding, n_rows=sample_rows)
+        print(f"INFO: Preprocessor fitted on {len(y_sample)} sampled rows "
+              f"({len(num_cols)} numeric, {len(cat_cols)} categorical columns)")
+
+        _, params = build_regressor("rf", num_cols, cat_cols, encoding)
+        mlflow.log_params({**params, "model": "rf", "encoding": encoding, "shards": shards,
+                           "preprocessor_sample_rows": len(y_sample)})
+
+        work_dir = shard_dir or tempfile.mkdtemp(prefix="shards-")
+        try:
+            shard_dirs = write_shards(prepared_dir, columns, work_dir, preprocessor, num_cols, cat_cols, keep, shards)
+            shard_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            build = partial(search_regressor, model="rf", num_cols=num_cols, cat_cols=cat_cols, encoding=encoding)
+            fitted = fit_shards(shard_dirs, build, params["n_estimators"], workers=workers)
+            regressor = merge_forests([joblib.load(path) for path, _, _ in fitted])
+            fit_seconds = time.perf_counter() - start
+        finally:
+            if not shard_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        rows = [n for _, n, _ in fitted]
+        print(f"INFO: Fitted {regressor.n_estimators} trees on {shards} shards ({sum(rows)} rows, "
+              f"{min(rows)}-{max(rows)} per shard) in {fit_seconds:.1f}s")
+        mlflow.log_metrics({"shard_seconds": shard_seconds, "fit_seconds": fit_seconds,
+                            "max_shard_fit_seconds": max(s for _, _, s in fitted), "train_rows": sum(rows)})
+
+        pipeline = Pipeline([
+            ("preprocessor", preprocessor),
+            ("regressor", regressor)
+        ])
+        save_model(pipeline, num_cols, cat_cols)
+
+        # --- Training-set fit, on the preprocessing sample ---
+        r2 = pipeline.score(X_sample, y_sample)
+        mlflow.log_metric("r2_score", r2)
+        print(f"INFO: Logged metric r2_score = {r2:.4f}")
+
+    print("✅ Sharded training complete and tracked with MLflow!")
+
+
+def run_train(users_csv, flights_csv, hotels_csv=None, prepared_dir=None, cache_dir=CACHE_DIR,
+              encoding="onehot", model="rf", search_mode=None, search_workers=None, max_latency_ms=None):
     print("INFO: [MLflow] Starting model training...")
 
     # --- Connect to your MLflow tracking server ---
@@ -20,60 +183,66 @@ def run_train(users_csv, flights_csv, hotels_csv=None):
     mlflow.set_experiment("Voyage Analytics Model")
 
     # --- Start MLflow run ---
-    with mlflow.start_run(run_name="RandomForest_Training"):
-
-        print("INFO: Merging datasets...")
-        df = prepare_dataset(users_csv, flights_csv, hotels_csv)
+    with mlflow.start_run(run_name="RandomForest_Training" if model == "rf" else "HistGradientBoosting_Training"):
 
         print("INFO: Preparing features and target...")
-        X, y, preprocessor, num_cols, cat_cols = prepare_X_y(df, target="price")
+        start = time.perf_counter()
+        load_frame = partial(load_training_frame, users_csv, flights_csv, hotels_csv, prepared_dir)
+        features = prepare_features(
+            [prepared_dir] if prepared_dir else [users_csv, flights_csv, hotels_csv],
+            load_frame,
+            target="price",
+            top_k=50,
+            encoding=encoding,
+            extra={"columns": training_columns()} if prepared_dir else None,
+            cache_dir=cache_dir,
+        )
+        preprocess_seconds = time.perf_counter() - start
+        Xt, y = features["Xt"], features["y"]
+        num_cols, cat_cols = features["num_cols"], features["cat_cols"]
+
+        # --- Log preprocessing cache usage ---
+        if cache_dir:
+            print(f"INFO: Preprocessing cache {'hit' if features['features_hit'] else 'miss'} "
+                  f"({features['features_key']}) in {preprocess_seconds:.2f}s")
+            mlflow.set_tags({"preprocess_cache_key": features["features_key"],
+                             "frame_cache_key": features["frame_key"]})
+        mlflow.log_metrics({
+            "preprocess_cache_hit": int(features["features_hit"]),
+            "frame_cache_hit": int(features["features_hit"] or bool(features["frame_hit"])),
+            "preprocess_seconds": preprocess_seconds,
+        })
 
         print(f"INFO: Using {len(num_cols)} numeric and {len(cat_cols)} categorical columns.")
-        print(f"INFO: Training pipeline on {X.shape[0]} rows, {X.shape[1]} features")
+        print(f"INFO: Training pipeline on {Xt.shape[0]} rows, {len(num_cols) + len(cat_cols)} features "
+              f"({encoding} encoding, {Xt.shape[1]} columns)")
 
-        # --- Model setup ---
-        params = {
-            "n_estimators": 200,
-            "max_depth": 10,
-            "random_state": 42
-        }
+        # --- Optional hyperparameter search (held-out validation rows, nested runs per trial) ---
+        search_params = None
+        if search_mode:
+            # Not Xt: its preprocessor was fitted on every row, validation rows included
+            df = PreprocessCache(cache_dir).frame(features["frame_key"], load_frame)[0] if cache_dir else load_frame()
+            best = run_search(df, model, num_cols, cat_cols, encoding, search_mode, search_workers, max_latency_ms)
+            del df
+            search_params = best["params"]
 
-        pipeline = Pipeline([
-            ("preprocessor", preprocessor),
-            ("regressor", RandomForestRegressor(**params))
-        ])
+        # --- Model setup (the selected candidate is refitted on all rows) ---
+        regressor, params = build_regressor(model, num_cols, cat_cols, encoding, search_params)
 
         # --- Log model parameters ---
-        mlflow.log_params(params)
-
-        # --- Train model ---
-        pipeline.fit(X, y)
-
-        # --- Save columns.json ---
-        os.makedirs("src", exist_ok=True)
-        columns_info = {"num_cols": num_cols, "cat_cols": cat_cols, "target": "price"}
-        with open("src/columns.json", "w", encoding="utf-8") as f:
-            json.dump(columns_info, f, indent=2)
-        print("INFO: columns.json saved in src/")
-
-        # --- Save model locally ---
-        model_dir = "model/voyage_model/1"
-        os.makedirs(model_dir, exist_ok=True)
-        model_path = os.path.join(model_dir, "model.pkl")
-        joblib.dump(pipeline, model_path)
-        print(f"INFO: Model saved at {model_path}")
-
-        # --- Log model to MLflow ---
-        mlflow.sklearn.log_model(
-            sk_model=pipeline,
-            artifact_path="model",
-            registered_model_name="VoyagePricePredictor"
-        )
+        mlflow.log_params({**params, "model": model, "encoding": encoding, "search": search_mode or "none"})
+
+        # --- Train model (the preprocessor is already fitted, Xt is its output) ---
+        regressor.fit(Xt, y)
+        pipeline = Pipeline([
+            ("preprocessor", features["preprocessor"]),
+            ("regressor", regressor)
+        ])
 
-        print("INFO: Model logged to MLflow successfully.")
+        save_model(pipeline, num_cols, cat_cols)
 
-        # --- Example metric (just for demo) ---
-        r2 = pipeline.score(X, y)
+        # --- Training-set fit (held-out scores come from --search) ---
+        r2 = regressor.score(Xt, y)
         mlflow.log_metric("r2_score", r2)
         print(f"INFO: Logged metric r2_score = {r2:.4f}")
 
@@ -82,8 +251,38 @@ def run_train(users_csv, flights_csv, hotels_csv=None):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--users", required=True)
-    parser.add_argument("--flights", required=True)
+    parser.add_argument("--users", required=False)
+    parser.add_argument("--flights", required=False)
     parser.add_argument("--hotels", required=False)
+    parser.add_argument("--prepared", required=False, help="column store from src/preprocess.py (instead of CSVs)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="preprocessing cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="always re-merge and re-fit the preprocessing")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="onehot",
+                        help="categorical encoding (see src/bench_feature_encoding.py)")
+    parser.add_argument("--model", choices=["rf", "hgb"], default="rf",
+                        help="rf: random forest; hgb: histogram gradient boosting (native categoricals with --encoding ordinal)")
+    parser.add_argument("--search", choices=SEARCH_MODES, default=None,
+                        help="hyperparameter search before the final fit (see src/hyperparam_search.py)")
+    parser.add_argument("--search-workers", type=int, default=None, help="search processes (default: CPU count)")
+    parser.add_argument("--max-latency-ms", type=float, default=None,
+                        help="only select candidates whose single-row predict takes at most this many ms")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="out-of-core training on this many on-disk shards (needs --prepared, --model rf)")
+    parser.add_argument("--shard-workers", type=int, default=None, help="shard fitting processes (default: CPU count)")
+    parser.add_argument("--sample-rows", type=int, default=100_000,
+                        help="rows sampled to fit the preprocessor in --shards mode")
     args = parser.parse_args()
-    run_train(args.users, args.flights, args.hotels)
+    if args.model == "rf" and args.encoding == "ordinal":
+        parser.error("--model rf does not support --encoding ordinal: use --encoding onehot/sparse or --model hgb")
+    if args.shards:
+        if not args.prepared or args.model != "rf" or args.search:
+            parser.error("--shards needs --prepared and --model rf, and does not combine with --search")
+        run_train_sharded(args.prepared, args.shards, args.shard_workers, args.encoding, args.sample_rows)
+    else:
+        if not args.prepared and not (args.users and args.flights):
+            parser.error("--users and --flights are required unless --prepared is given")
+        if args.model == "hgb" and args.encoding == "sparse":
+            parser.error("--model hgb needs a dense matrix: use --encoding ordinal or onehot")
+        run_train(args.users, args.flights, args.hotels, args.prepared, None if args.no_cache else args.cache_dir,
+                  encoding=args.encoding, model=args.model, search_mode=args.search,
+                  search_workers=args.search_workers, max_latency_ms=args.max_latency_ms)